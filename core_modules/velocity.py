@@ -10,6 +10,7 @@ from typing import Dict, List, Tuple, Optional, Any
 import numpy as np
 import math
 import logging
+import time
 from datetime import datetime
 
 # Configure logging for production use
@@ -77,23 +78,337 @@ class VelocityProfile:
             description="More permissive for development/testing"
         )
 
+class ThresholdTable:
+    """
+    Immutable threshold lookup indexed [profile, mode, level].
+    values has shape (profiles, modes, len(Layer) + 1) with column 0 unused, so a
+    (profile, mode) row can be indexed directly by integer layer levels, one at a
+    time or gathered for a whole batch. The array is read-only; owners rebuild a
+    new table when inputs change and swap the reference, so concurrent readers
+    always see a complete table.
+    """
+    
+    def __init__(self, profiles: Tuple[str, ...], modes: Tuple[str, ...], values: np.ndarray):
+        if values.shape != (len(profiles), len(modes), len(Layer) + 1):
+            raise ValueError(f"values shape {values.shape} does not match profiles x modes x levels")
+        self.profiles = tuple(profiles)
+        self.modes = tuple(modes)
+        self.values = values
+        self.values.setflags(write=False)
+        self._profile_index = {name: i for i, name in enumerate(self.profiles)}
+        self._mode_index = {name: i for i, name in enumerate(self.modes)}
+    
+    @classmethod
+    def build(cls, profile_thresholds: Dict[str, Dict[int, float]],
+              mode_multipliers: Optional[Dict[str, float]] = None,
+              layer_multipliers: Optional[Dict[int, float]] = None,
+              fallback: Optional[float] = None) -> 'ThresholdTable':
+        """
+        Build a table from per-profile base thresholds keyed by layer level.
+        Each entry is base * mode multiplier * layer multiplier clipped to [0, 1];
+        entries that end up at 0 are replaced by fallback when one is given.
+        Levels missing from a profile use the Layer default threshold.
+        """
+        base = np.zeros((len(profile_thresholds), len(Layer) + 1))
+        for i, thresholds in enumerate(profile_thresholds.values()):
+            for layer in Layer:
+                base[i, layer.level] = thresholds.get(layer.level, layer.threshold)
+        return cls._from_base(tuple(profile_thresholds), base, mode_multipliers, layer_multipliers, fallback)
+    
+    def scaled(self, mode_multipliers: Dict[str, float],
+               layer_multipliers: Optional[Dict[int, float]] = None,
+               fallback: Optional[float] = None, mode: str = "base") -> 'ThresholdTable':
+        """
+        Derive a table with the same profiles from this table's `mode` rows, using
+        the same rules as build. Consumers with their own mode and layer scaling
+        (e.g. each CosmosPROEngine) read a shared VelocityPolicyManager table
+        through this instead of rebuilding the profiles themselves.
+        """
+        if mode not in self._mode_index:
+            raise ValueError(f"Unknown mode: {mode}")
+        base = self.values[:, self._mode_index[mode]]
+        return self._from_base(self.profiles, base, mode_multipliers, layer_multipliers, fallback)
+    
+    @classmethod
+    def _from_base(cls, profiles: Tuple[str, ...], base: np.ndarray,
+                   mode_multipliers: Optional[Dict[str, float]],
+                   layer_multipliers: Optional[Dict[int, float]],
+                   fallback: Optional[float]) -> 'ThresholdTable':
+        modes = mode_multipliers or {"base": 1.0}
+        scale = np.ones(len(Layer) + 1)
+        for level, multiplier in (layer_multipliers or {}).items():
+            scale[level] = multiplier
+        values = np.clip(base[:, None, :] * np.fromiter(modes.values(), dtype=np.float64)[None, :, None] * scale, 0.0, 1.0)
+        if fallback is not None:
+            values = np.where(values > 0, values, min(max(fallback, 0.0), 1.0))
+        values[:, :, 0] = 0.0
+        return cls(profiles, tuple(modes), values)
+    
+    def row(self, profile: str, mode: str = "base") -> np.ndarray:
+        """Read-only thresholds for one profile and mode, indexed by layer level"""
+        try:
+            return self.values[self._profile_index[profile], self._mode_index[mode]]
+        except KeyError as e:
+            raise ValueError(f"Unknown profile or mode: {e.args[0]}") from None
+    
+    def lookup(self, profile: str, mode: str, level: int) -> float:
+        """Single threshold"""
+        return float(self.row(profile, mode)[level])
+
+
+class CumulativeVelocityAccumulator:
+    """
+    Incremental form of V_cumulative = 1 - ∏(1 - v_k).
+    The product is kept in log space (Σ log1p(-v_k)) with compensated summation,
+    so add/remove are O(1) for sliding windows and partial accumulators from
+    parallel shards can be merged. Velocities of 1.0 are counted separately
+    because log1p(-1) is -inf.
+    """
+    
+    def __init__(self, velocities: Optional[List[float]] = None):
+        self.log_sum = 0.0
+        self._comp = 0.0  # Neumaier compensation term
+        self.saturated = 0  # number of v >= 1.0
+        self.count = 0
+        if velocities:
+            self.add_many(velocities)
+    
+    @staticmethod
+    def _valid(v: Any) -> bool:
+        return isinstance(v, (int, float)) and not math.isnan(v) and not math.isinf(v)
+    
+    def _accumulate(self, term: float) -> None:
+        t = self.log_sum + term
+        if abs(self.log_sum) >= abs(term):
+            self._comp += (self.log_sum - t) + term
+        else:
+            self._comp += (term - t) + self.log_sum
+        self.log_sum = t
+    
+    def _apply(self, v: float, sign: int) -> None:
+        v = max(0.0, min(1.0, float(v)))
+        if v >= 1.0:
+            self.saturated += sign
+        elif v > 0.0:
+            self._accumulate(sign * math.log1p(-v))
+        self.count += sign
+    
+    def add(self, v: float) -> bool:
+        """Add one velocity. Invalid values (NaN/Inf/non-numeric) are skipped and return False"""
+        if not self._valid(v):
+            return False
+        self._apply(v, 1)
+        return True
+    
+    def remove(self, v: float) -> bool:
+        """Remove a velocity previously added (sliding-window eviction)"""
+        if not self._valid(v):
+            return False
+        self._apply(v, -1)
+        return True
+    
+    def add_many(self, velocities: List[float]) -> int:
+        """Vectorized add; returns the number of accepted velocities"""
+        try:
+            arr = np.asarray(velocities)
+        except (TypeError, ValueError):
+            arr = None
+        if arr is None or arr.dtype.kind not in "biuf":
+            return sum(self.add(v) for v in velocities)
+        arr = arr.astype(np.float64).ravel()
+        arr = np.clip(arr[np.isfinite(arr)], 0.0, 1.0)
+        ones = arr >= 1.0
+        self.saturated += int(ones.sum())
+        self._accumulate(float(np.log1p(-arr[~ones]).sum()))
+        self.count += len(arr)
+        return len(arr)
+    
+    def merge(self, other: 'CumulativeVelocityAccumulator') -> 'CumulativeVelocityAccumulator':
+        """Fold another (shard) accumulator into this one"""
+        self._accumulate(other.log_sum + other._comp)
+        self.saturated += other.saturated
+        self.count += other.count
+        return self
+    
+    def subtract(self, other: 'CumulativeVelocityAccumulator') -> 'CumulativeVelocityAccumulator':
+        """Inverse of merge, used to drop an expired partial from a window"""
+        self._accumulate(-(other.log_sum + other._comp))
+        self.saturated -= other.saturated
+        self.count -= other.count
+        return self
+    
+    def value(self, cap: Optional[float] = None) -> float:
+        """Cumulative velocity in [0, 1], optionally capped"""
+        if self.count <= 0:
+            return 0.0
+        cumulative = 1.0 if self.saturated > 0 else -math.expm1(self.log_sum + self._comp)
+        cumulative = max(0.0, min(1.0, cumulative))
+        return min(cumulative, cap) if cap is not None else cumulative
+    
+    def reset(self) -> None:
+        self.log_sum = self._comp = 0.0
+        self.saturated = self.count = 0
+
+class BreachHistory:
+    """
+    Fixed-capacity ring buffer of velocity breaches with running aggregates.
+    Totals, per-layer counts, summed excess and max velocity are updated on
+    insert and cover every breach since the last reset; windowed rates come from
+    per-second buckets over the last hour. Statistics therefore cost the same
+    regardless of uptime. Iteration and slicing yield breach dicts in insertion
+    order for the retained entries.
+    """
+    
+    WINDOWS = {"1m": 60, "5m": 300, "1h": 3600}
+    _BUCKETS = 3600
+    
+    def __init__(self, capacity: int = 10000):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._timestamp = np.zeros(capacity)
+        self._level = np.zeros(capacity, dtype=np.int8)
+        self._velocity = np.zeros(capacity)
+        self._threshold = np.zeros(capacity)
+        self._bucket_second = np.full(self._BUCKETS, -1, dtype=np.int64)
+        self._bucket_count = np.zeros(self._BUCKETS, dtype=np.int64)
+        self._names = {layer.level: layer.display_name for layer in Layer}
+        self.reset()
+    
+    def reset(self) -> None:
+        """Drop retained breaches and aggregates"""
+        self.total = 0
+        self.layer_counts = np.zeros(len(Layer) + 1, dtype=np.int64)
+        self.excess_sum = 0.0
+        self.max_velocity = 0.0
+        self._bucket_second.fill(-1)
+        self._bucket_count.fill(0)
+    
+    def __len__(self) -> int:
+        return min(self.total, self.capacity)
+    
+    def _bump(self, timestamp: float, n: int) -> None:
+        second = int(timestamp)
+        b = second % self._BUCKETS
+        if self._bucket_second[b] != second:
+            self._bucket_second[b] = second
+            self._bucket_count[b] = 0
+        self._bucket_count[b] += n
+    
+    def record(self, level: int, velocity: float, threshold: float, timestamp: Optional[float] = None) -> None:
+        """Insert one breach"""
+        ts = time.time() if timestamp is None else timestamp
+        slot = self.total % self.capacity
+        self._timestamp[slot] = ts
+        self._level[slot] = level
+        self._velocity[slot] = velocity
+        self._threshold[slot] = threshold
+        self.total += 1
+        self.layer_counts[level] += 1
+        self.excess_sum += velocity - threshold
+        self.max_velocity = max(self.max_velocity, velocity)
+        self._bump(ts, 1)
+    
+    def extend(self, levels: np.ndarray, velocities: np.ndarray, thresholds: np.ndarray,
+               timestamp: Optional[float] = None) -> None:
+        """Insert many breaches sharing one timestamp"""
+        n = len(velocities)
+        if not n:
+            return
+        ts = time.time() if timestamp is None else timestamp
+        levels = np.asarray(levels, dtype=np.int64)
+        velocities = np.asarray(velocities, dtype=np.float64)
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        keep = min(n, self.capacity)
+        slots = (self.total + n - keep + np.arange(keep)) % self.capacity
+        self._timestamp[slots] = ts
+        self._level[slots] = levels[-keep:]
+        self._velocity[slots] = velocities[-keep:]
+        self._threshold[slots] = thresholds[-keep:]
+        self.total += n
+        self.layer_counts += np.bincount(levels, minlength=self.layer_counts.size)
+        self.excess_sum += float((velocities - thresholds).sum())
+        self.max_velocity = max(self.max_velocity, float(velocities.max()))
+        self._bump(ts, n)
+    
+    def append(self, breach: Dict[str, Any]) -> None:
+        """Insert a breach dict in the legacy breach_history format"""
+        level = next(l for l, name in self._names.items() if name == breach["layer"])
+        ts = breach.get("timestamp")
+        self.record(level, breach["velocity"], breach["threshold"],
+                    datetime.fromisoformat(ts).timestamp() if isinstance(ts, str) else ts)
+    
+    def count_since(self, seconds: float, now: Optional[float] = None) -> int:
+        """Breaches in the last `seconds` (at most one hour, one-second resolution)"""
+        current = int(time.time() if now is None else now)
+        live = (self._bucket_second > current - seconds) & (self._bucket_second <= current)
+        return int(self._bucket_count[live].sum())
+    
+    def rates(self, now: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+        """Breach counts and per-minute rates over the 1m/5m/1h windows"""
+        out = {}
+        for key, seconds in self.WINDOWS.items():
+            count = self.count_since(seconds, now)
+            out[key] = {"count": count, "per_minute": count * 60.0 / seconds}
+        return out
+    
+    def _entry(self, i: int) -> Dict[str, Any]:
+        slot = (self.total - len(self) + i) % self.capacity
+        velocity = float(self._velocity[slot])
+        threshold = float(self._threshold[slot])
+        return {
+            "timestamp": datetime.fromtimestamp(self._timestamp[slot]).isoformat(),
+            "layer": self._names[int(self._level[slot])],
+            "velocity": velocity,
+            "threshold": threshold,
+            "excess": velocity - threshold
+        }
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._entry(i) for i in range(*index.indices(len(self)))]
+        n = len(self)
+        if not -n <= index < n:
+            raise IndexError(index)
+        return self._entry(index % n)
+    
+    def __iter__(self):
+        return (self._entry(i) for i in range(len(self)))
+    
+    def recent(self, n: int = 10) -> List[Dict[str, Any]]:
+        """Last n retained breaches, oldest first"""
+        return self[-n:] if n > 0 else []
+
+
 class VelocityPolicyManager:
     """
     Manages escape velocity thresholds across layers.
     Supports dynamic profile switching for different operational modes.
+    threshold_table is the shared per-profile table; engines attached through
+    their velocity_policy read it and pick up every rebuild.
     """
     
-    def __init__(self, profile: str = "standard"):
-        """Initialize with specified profile"""
+    def __init__(self, profile: str = "standard", breach_capacity: int = 10000):
+        """Initialize with specified profile; the last breach_capacity breaches are retained"""
         self.profiles = {
             "standard": VelocityProfile.standard(),
             "conservative": VelocityProfile.conservative(),
             "aggressive": VelocityProfile.aggressive()
         }
         self.current_profile = self.profiles.get(profile, VelocityProfile.standard())
-        self.breach_history = []  # Track breaches for analysis
+        self.breach_history = BreachHistory(breach_capacity)  # Track breaches for analysis
+        self._rebuild_thresholds()
         logger.info(f"Initialized VelocityPolicyManager with {profile} profile")
     
+    def _rebuild_thresholds(self) -> None:
+        """Rebuild the threshold table from all profiles and select the current one"""
+        table = ThresholdTable.build({
+            name: {layer.level: value for layer, value in profile.thresholds.items()}
+            for name, profile in self.profiles.items()
+        })
+        self.threshold_table = table
+        self._thresholds = table.row(self.current_profile.name)
+    
     def set_profile(self, profile_name: str) -> None:
         """Switch to a different velocity profile"""
         if profile_name not in self.profiles:
@@ -101,11 +416,36 @@ class VelocityPolicyManager:
         
         old_profile = self.current_profile.name
         self.current_profile = self.profiles[profile_name]
+        self._thresholds = self.threshold_table.row(profile_name)
         logger.info(f"Switched velocity profile from {old_profile} to {profile_name}")
     
+    def set_threshold(self, layer: Layer, value: float) -> None:
+        """Override one layer threshold in the current profile"""
+        profile = self.current_profile
+        self.profiles[profile.name] = self.current_profile = VelocityProfile(
+            name=profile.name,
+            thresholds={**profile.thresholds, layer: value},
+            cumulative_cap=profile.cumulative_cap,
+            description=profile.description
+        )
+        self._rebuild_thresholds()
+        logger.info(f"Set {layer.display_name} threshold to {value:.3f} in {profile.name} profile")
+    
+    def apply_adaptive_thresholds(self, adaptive: 'AdaptiveThresholdManager', activate: bool = True) -> None:
+        """Publish learned thresholds as the "adaptive" profile, optionally switching to it"""
+        self.profiles["adaptive"] = VelocityProfile(
+            name="adaptive",
+            thresholds=dict(adaptive.current_thresholds),
+            cumulative_cap=self.current_profile.cumulative_cap,
+            description="Thresholds learned by AdaptiveThresholdManager"
+        )
+        if activate:
+            self.current_profile = self.profiles["adaptive"]
+        self._rebuild_thresholds()
+    
     def get_threshold(self, layer: Layer) -> float:
         """Get current threshold for a specific layer"""
-        return self.current_profile.thresholds.get(layer, layer.threshold)
+        return float(self._thresholds[layer.level])
     
     def check_velocity_breach(self, layer: Layer, velocity: float) -> Tuple[bool, float]:
         """
@@ -125,18 +465,71 @@ class VelocityPolicyManager:
         is_breached = velocity > threshold
         
         if is_breached:
-            breach_info = {
-                "timestamp": datetime.now().isoformat(),
-                "layer": layer.display_name,
-                "velocity": velocity,
-                "threshold": threshold,
-                "excess": velocity - threshold
-            }
-            self.breach_history.append(breach_info)
+            self.breach_history.record(layer.level, velocity, threshold)
             logger.warning(f"Velocity breach at {layer.display_name}: {velocity:.3f} > {threshold:.3f}")
         
         return is_breached, threshold
     
+    def _layer_levels(self, layers: Any, n: int) -> np.ndarray:
+        """Normalise a Layer, an array of Layers or an array of integer levels to int levels"""
+        if isinstance(layers, Layer):
+            return np.full(n, layers.level, dtype=np.int64)
+        arr = np.asarray(layers)
+        if arr.dtype.kind in "iu":
+            levels = arr.astype(np.int64, copy=False)
+        else:
+            levels = np.fromiter((layer.level for layer in arr.ravel()), dtype=np.int64, count=arr.size).reshape(arr.shape)
+        if levels.size and (levels.min() < 1 or levels.max() > len(Layer)):
+            raise ValueError(f"Layer levels must be within 1..{len(Layer)}")
+        return np.broadcast_to(levels.ravel(), (n,))
+    
+    def check_velocity_breach_batch(self, layers: Any, velocities: Any) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorised check_velocity_breach over many (layer, velocity) pairs.
+        
+        layers may be a single Layer, an array of Layer members or an array of
+        integer levels (1-7). Semantics match the scalar path: NaN/Inf velocities
+        count as breaches with threshold 0.0 and are not recorded, non-numeric
+        velocities are not breaches (threshold 0.0). Breaches are appended to the
+        history in one pass sharing a single timestamp, and logged once per call.
+        Returns: (is_breached, threshold_value) arrays
+        """
+        try:
+            raw = np.asarray(velocities)
+        except ValueError:  # ragged input
+            raw = None
+        if raw is None or raw.dtype.kind not in "biufO":
+            # keep the original objects so mixed input like [0.5, "x"] is checked
+            # element by element instead of being coerced to a string array
+            raw = np.asarray(velocities, dtype=object)
+        if raw.dtype.kind in "biuf":
+            values = raw.astype(np.float64, copy=False).ravel()
+            valid = np.ones(values.size, dtype=bool)
+        else:
+            flat = raw.ravel()
+            valid = np.fromiter((isinstance(v, (int, float)) for v in flat), dtype=bool, count=flat.size)
+            values = np.fromiter((float(v) if ok else 0.0 for v, ok in zip(flat, valid)), dtype=np.float64, count=flat.size)
+        n = values.size
+        levels = self._layer_levels(layers, n)
+        
+        finite = np.isfinite(values)
+        nonfinite = valid & ~finite
+        checked = valid & finite
+        thresholds = np.where(checked, self._thresholds[levels], 0.0)
+        breached = nonfinite | (checked & (values > thresholds))
+        
+        if not valid.all():
+            logger.error(f"Invalid velocity type for {int((~valid).sum())} entries")
+        if nonfinite.any():
+            logger.warning(f"NaN or Inf velocity detected in {int(nonfinite.sum())} entries")
+        
+        recorded = np.flatnonzero(checked & breached)
+        if recorded.size:
+            self.breach_history.extend(levels[recorded], values[recorded], thresholds[recorded])
+            logger.warning(f"Velocity breaches in batch: {recorded.size} of {n}")
+        
+        return breached.reshape(raw.shape), thresholds.reshape(raw.shape)
+    
     def calculate_cumulative(self, velocity_list: List[float]) -> float:
         """
         Calculate cumulative impact using the cosmic formula:
@@ -146,25 +539,16 @@ class VelocityPolicyManager:
         if not velocity_list:
             return 0.0
         
-        # Filter out invalid values
-        valid_velocities = []
-        for v in velocity_list:
-            if isinstance(v, (int, float)) and not math.isnan(v) and not math.isinf(v):
-                # Clamp individual velocities to [0, 1]
-                valid_velocities.append(max(0.0, min(1.0, v)))
-            else:
-                logger.warning(f"Skipping invalid velocity in cumulative calculation: {v}")
+        # Invalid values are filtered and individual velocities clamped to [0, 1]
+        accumulator = CumulativeVelocityAccumulator()
+        accepted = accumulator.add_many(velocity_list)
+        if accepted < len(velocity_list):
+            logger.warning(f"Skipping {len(velocity_list) - accepted} invalid velocities in cumulative calculation")
         
-        if not valid_velocities:
+        if not accepted:
             return 0.0
         
-        # Calculate cumulative using the product formula
-        # V_cumulative = 1 - ∏(1 - v_k)
-        product = 1.0
-        for v in valid_velocities:
-            product *= (1.0 - v)
-        
-        cumulative = 1.0 - product
+        cumulative = accumulator.value()
         
         # Apply cap from current profile
         capped_cumulative = min(cumulative, self.current_profile.cumulative_cap)
@@ -207,6 +591,56 @@ class VelocityPolicyManager:
         
         return impact
     
+    def calculate_impact_batch(self, before: Any, after: Any, offsets: Optional[Any] = None,
+                               dtype: Any = np.float64) -> np.ndarray:
+        """
+        Row-wise calculate_impact for many before/after pairs.
+        
+        Either pass two (N, D) matrices, or two flat 1-D arrays holding ragged
+        rows back to back together with offsets (N + 1 boundaries, starting at 0
+        and ending at the array length). Near-zero rows give 0.0 (zero to zero)
+        or 0.5 (creation from nothing), and NaN impacts become 1.0, as in the
+        scalar version. dtype=np.float32 halves the memory traffic at reduced
+        precision.
+        Returns: (N,) impacts in dtype
+        """
+        before = np.asarray(before, dtype=dtype)
+        after = np.asarray(after, dtype=dtype)
+        if before.shape != after.shape:
+            raise ValueError(f"before/after shape mismatch: {before.shape} vs {after.shape}")
+        
+        if offsets is None:
+            if before.ndim != 2:
+                raise ValueError("Expected (N, D) matrices when offsets is not given")
+            def row_sq(x: np.ndarray) -> np.ndarray:
+                return np.einsum("ij,ij->i", x, x)
+        else:
+            offsets = np.asarray(offsets, dtype=np.int64)
+            if (before.ndim != 1 or offsets.ndim != 1 or offsets.size < 1 or offsets[0] != 0
+                    or offsets[-1] != before.size or np.any(np.diff(offsets) < 0)):
+                raise ValueError("offsets must be non-decreasing boundaries from 0 to len(before)")
+            nonempty = np.diff(offsets) > 0
+            starts = offsets[:-1][nonempty]
+            def row_sq(x: np.ndarray) -> np.ndarray:
+                out = np.zeros(offsets.size - 1, dtype=x.dtype)
+                if starts.size:
+                    out[nonempty] = np.add.reduceat(x * x, starts)
+                return out
+        
+        before_norm = np.sqrt(row_sq(before))
+        after_norm = np.sqrt(row_sq(after))
+        near_zero = before_norm < 1e-12
+        safe_norm = np.where(near_zero, 1.0, before_norm).astype(dtype, copy=False)
+        
+        with np.errstate(invalid="ignore", over="ignore"):
+            change_rate = np.sqrt(row_sq(after - before)) / safe_norm
+            scale_factor = np.tanh(after_norm / safe_norm)
+            impact = 0.5 * change_rate + 0.5 * np.abs(scale_factor - 1.0)
+        
+        impact = np.where(np.isnan(impact), 1.0, np.clip(impact, 0.0, 1.0))
+        impact = np.where(near_zero, np.where(after_norm < 1e-12, 0.0, 0.5), impact)
+        return impact.astype(dtype, copy=False)
+    
     def get_layer_transition_probability(self, from_layer: Layer, to_layer: Layer) -> float:
         """
         Get probability of impact propagating between layers
@@ -242,51 +676,180 @@ class VelocityPolicyManager:
         return max(0.0, min(1.0, probability))  # Clamp to [0, 1]
     
     def get_breach_statistics(self) -> Dict[str, Any]:
-        """Get statistics about velocity breaches"""
-        if not self.breach_history:
+        """Get statistics about velocity breaches (constant time, from running aggregates)"""
+        history = self.breach_history
+        if not history.total:
             return {
                 "total_breaches": 0,
                 "breaches_by_layer": {},
                 "average_excess": 0.0,
-                "max_velocity": 0.0
+                "max_velocity": 0.0,
+                "rates": history.rates()
             }
         
-        breaches_by_layer = {}
-        total_excess = 0.0
-        max_velocity = 0.0
-        
-        for breach in self.breach_history:
-            layer = breach["layer"]
-            breaches_by_layer[layer] = breaches_by_layer.get(layer, 0) + 1
-            total_excess += breach["excess"]
-            max_velocity = max(max_velocity, breach["velocity"])
+        breaches_by_layer = {
+            layer.display_name: int(history.layer_counts[layer.level])
+            for layer in Layer if history.layer_counts[layer.level]
+        }
         
         return {
-            "total_breaches": len(self.breach_history),
+            "total_breaches": history.total,
             "breaches_by_layer": breaches_by_layer,
-            "average_excess": total_excess / len(self.breach_history),
-            "max_velocity": max_velocity,
-            "recent_breaches": self.breach_history[-10:]  # Last 10 breaches
+            "average_excess": history.excess_sum / history.total,
+            "max_velocity": history.max_velocity,
+            "rates": history.rates(),
+            "recent_breaches": history.recent(10)  # Last 10 breaches
         }
     
     def reset_breach_history(self) -> None:
         """Clear breach history"""
-        self.breach_history = []
+        self.breach_history.reset()
         logger.info("Breach history cleared")
 
+class QuantileSketch:
+    """
+    Mergeable streaming quantile sketch over a fixed log-spaced bucket grid
+    Quantiles carry a bounded relative error; memory is fixed by the grid size.
+    Values at or below min_value share one bucket, values above max_value are
+    clamped to the top bucket. Sketches with the same grid merge by adding counts,
+    and decay < 1 ages every earlier sample by that factor per new sample, so a
+    sample k updates old carries weight decay**k (count is the decayed weight,
+    samples the raw number of samples seen).
+    """
+    
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-6,
+                 max_value: float = 1e6, decay: float = 1.0):
+        if not 0.0 < relative_accuracy < 1.0:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        if not 0.0 < decay <= 1.0:
+            raise ValueError("decay must be in (0, 1]")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+        self.decay = decay
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._offset = math.floor(math.log(min_value) / self._log_gamma)
+        size = math.ceil(math.log(max_value) / self._log_gamma) - self._offset + 1
+        self._counts = np.zeros(size + 1)  # slot 0 holds values <= min_value
+        self.count = 0.0
+        self.samples = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+    
+    def _keys(self, values: np.ndarray) -> np.ndarray:
+        keys = np.ceil(np.log(np.maximum(values, self.min_value)) / self._log_gamma) - self._offset
+        keys = np.clip(keys, 1, self._counts.size - 1).astype(np.int64)
+        keys[values <= self.min_value] = 0
+        return keys
+    
+    def update(self, values) -> None:
+        """Add samples (scalar or array); NaN and infinite values are ignored"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        n = values.size
+        if not n:
+            return
+        if self.decay < 1.0:
+            aged = self.decay ** n
+            self._counts *= aged
+            self.count *= aged
+            self.total *= aged
+            self.total_sq *= aged
+            weights = self.decay ** np.arange(n - 1, -1, -1, dtype=np.float64)
+        else:
+            weights = np.ones(n)
+        np.add.at(self._counts, self._keys(values), weights)
+        self.count += float(weights.sum())
+        self.samples += n
+        weighted = weights * values
+        self.total += float(weighted.sum())
+        self.total_sq += float(np.dot(weighted, values))
+    
+    def _check_compatible(self, other: 'QuantileSketch') -> None:
+        if (other.relative_accuracy, other.min_value, other.max_value) != \
+                (self.relative_accuracy, self.min_value, self.max_value):
+            raise ValueError("Cannot merge sketches with different bucket grids")
+    
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Fold another sketch with the same grid into this one"""
+        self._check_compatible(other)
+        self._counts += other._counts
+        self.count += other.count
+        self.samples += other.samples
+        self.total += other.total
+        self.total_sq += other.total_sq
+        return self
+    
+    def quantile(self, q: float) -> float:
+        """Approximate q-quantile (0 <= q <= 1); NaN when empty"""
+        if self.count <= 0:
+            return float("nan")
+        cumulative = np.cumsum(self._counts)
+        key = int(np.searchsorted(cumulative, q * cumulative[-1], side="right"))
+        key = min(key, self._counts.size - 1)
+        if key == 0:
+            return 0.0
+        return 2 * self._gamma ** (key + self._offset) / (self._gamma + 1)
+    
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count > 0 else 0.0
+    
+    @property
+    def std(self) -> float:
+        if self.count <= 0:
+            return 0.0
+        return math.sqrt(max(self.total_sq / self.count - self.mean ** 2, 0.0))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize for shipping between workers (sparse bucket counts)"""
+        keys = np.flatnonzero(self._counts)
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "min_value": self.min_value,
+            "max_value": self.max_value,
+            "decay": self.decay,
+            "keys": keys.tolist(),
+            "counts": self._counts[keys].tolist(),
+            "count": self.count,
+            "samples": self.samples,
+            "total": self.total,
+            "total_sq": self.total_sq
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'QuantileSketch':
+        """Rebuild a sketch produced by to_dict"""
+        sketch = cls(data["relative_accuracy"], data["min_value"], data["max_value"], data.get("decay", 1.0))
+        sketch._counts[np.asarray(data["keys"], dtype=np.int64)] = data["counts"]
+        sketch.count = data["count"]
+        sketch.samples = data.get("samples", int(round(data["count"])))
+        sketch.total = data["total"]
+        sketch.total_sq = data["total_sq"]
+        return sketch
+
+
 class AdaptiveThresholdManager:
     """
     Learn optimal thresholds from execution history
     Uses exponential moving average of successful executions
+    Impact distributions are kept in one QuantileSketch per layer
     """
     
-    def __init__(self, alpha: float = 0.1):
+    def __init__(self, alpha: float = 0.1, decay: float = 0.997, relative_accuracy: float = 0.01):
         """
         Initialize adaptive threshold manager
         alpha: Learning rate for exponential moving average
+        decay: Per-sample weight applied to earlier impacts; the default leaves
+               impacts older than ~1000 samples under 5% weight, tracking the
+               former last-1000-samples window (1.0 keeps all history)
+        relative_accuracy: Relative error bound of the per-layer quantile sketches
         """
         self.alpha = alpha
-        self.threshold_history = {layer: [] for layer in Layer}
+        self.sketches = {
+            layer: QuantileSketch(relative_accuracy=relative_accuracy, decay=decay) for layer in Layer
+        }
         self.current_thresholds = {layer: layer.threshold for layer in Layer}
         logger.info(f"Initialized AdaptiveThresholdManager with α={alpha}")
     
@@ -296,22 +859,18 @@ class AdaptiveThresholdManager:
         Update threshold for a layer based on impact history
         Aims to block exactly target_block_rate of impacts
         """
-        if not impact_history:
+        if not len(impact_history):
             return self.current_thresholds[layer]
         
-        # Store history
-        self.threshold_history[layer].extend(impact_history)
-        
-        # Use only recent history (last 1000 samples)
-        recent_history = self.threshold_history[layer][-1000:]
+        # Fold new impacts into the layer sketch
+        sketch = self.sketches[layer]
+        sketch.update(impact_history)
         
-        if len(recent_history) < 20:  # Need minimum samples
+        if sketch.samples < 20:  # Need minimum samples
             return self.current_thresholds[layer]
         
         # Calculate optimal threshold (95th percentile by default)
-        sorted_impacts = np.sort(recent_history)
-        percentile_idx = int(len(sorted_impacts) * (1 - target_block_rate))
-        optimal_threshold = sorted_impacts[percentile_idx] * 1.1  # 10% safety margin
+        optimal_threshold = sketch.quantile(1 - target_block_rate) * 1.1  # 10% safety margin
         
         # Apply exponential moving average
         old_threshold = self.current_thresholds[layer]
@@ -332,18 +891,33 @@ class AdaptiveThresholdManager:
         """Get current adaptive threshold for a layer"""
         return self.current_thresholds.get(layer, layer.threshold)
     
+    def merge(self, other: 'AdaptiveThresholdManager') -> None:
+        """Fold another manager's impact sketches (e.g. from another worker) into this one"""
+        for layer in Layer:
+            self.sketches[layer].merge(other.sketches[layer])
+    
+    def export_sketches(self) -> Dict[str, Dict[str, Any]]:
+        """Serializable per-layer sketches, keyed by layer display name"""
+        return {layer.display_name: self.sketches[layer].to_dict() for layer in Layer}
+    
+    def merge_sketches(self, data: Dict[str, Dict[str, Any]]) -> None:
+        """Merge sketches produced by export_sketches on another worker"""
+        for layer in Layer:
+            if layer.display_name in data:
+                self.sketches[layer].merge(QuantileSketch.from_dict(data[layer.display_name]))
+    
     def get_learning_statistics(self) -> Dict[str, Any]:
         """Get statistics about threshold learning"""
         stats = {}
         for layer in Layer:
-            history = self.threshold_history[layer]
-            if history:
+            sketch = self.sketches[layer]
+            if sketch.samples > 0:
                 stats[layer.display_name] = {
-                    "samples": len(history),
+                    "samples": sketch.samples,
                     "current_threshold": self.current_thresholds[layer],
                     "default_threshold": layer.threshold,
-                    "mean_impact": np.mean(history),
-                    "std_impact": np.std(history),
+                    "mean_impact": sketch.mean,
+                    "std_impact": sketch.std,
                     "adaptation_ratio": self.current_thresholds[layer] / layer.threshold
                 }
         return stats
\ No newline at end of file
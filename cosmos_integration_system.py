@@ -70,6 +70,9 @@ except ImportError:
     AUTH_AVAILABLE = False
     print("⚠️  Warning: auth_system.py not available")
 
+# 요청 묶음 처리기
+from request_coalescer import RequestCoalescer, next_execution_id
+
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -123,6 +126,9 @@ class CosmosIntegrationSystem:
         # DNA 코돈 매핑
         self.codon_map = self._generate_codon_map()
         
+        # 요청 묶음 처리기 (enable_coalescing으로 활성화)
+        self.coalescer: Optional[RequestCoalescer] = None
+        
         # 인증 데코레이터 설정
         self._setup_auth_decorators()
         
@@ -260,8 +266,16 @@ class CosmosIntegrationSystem:
                             'code': 'INPUT_TOO_LARGE'
                         }), 413
                 
-                # 실행 결과 생성
-                result = self._execute_cosmos_logic(group, input_data, profile, options)
+                # 실행 결과 생성 (코얼레서가 켜져 있으면 동시 요청과 묶어 실행)
+                if self.coalescer is not None:
+                    try:
+                        # options.timeout_s는 검증 후 서버 기본값(coalescer.timeout_s) 이하로 제한됨
+                        result = self.coalescer.submit(group, profile, input_data, options,
+                                                       timeout=options.get('timeout_s'))
+                    except TimeoutError as e:
+                        return jsonify({'error': str(e), 'code': 'TIMEOUT'}), 504
+                else:
+                    result = self._execute_cosmos_logic(group, input_data, profile, options)
                 
                 # 인증이 활성화된 경우 사용량 증가
                 if AUTH_AVAILABLE and api_key:
@@ -311,7 +325,8 @@ class CosmosIntegrationSystem:
                 'mode': self.current_mode,
                 'threshold': self.threshold,
                 'recent_executions': self.execution_history[-10:],
-                'connected_clients': len(self.connected_clients)
+                'connected_clients': len(self.connected_clients),
+                'coalescer': self.coalescer.get_stats() if self.coalescer else None
             })
         
         # 인증 관련 엔드포인트들
@@ -469,7 +484,7 @@ class CosmosIntegrationSystem:
         }
         
         result = {
-            'execution_id': f"exec_{int(time.time() * 1000)}",
+            'execution_id': next_execution_id(),
             'group': group,
             'profile': profile,
             'input': input_data,
@@ -486,6 +501,90 @@ class CosmosIntegrationSystem:
         
         return result
     
+    def _execute_cosmos_logic_batch(self, group: str, profile: str, inputs: List[List[Any]],
+                                    options_list: List[Dict]) -> List[Dict]:
+        """
+        여러 요청의 COSMOS 실행을 한 번에 처리 (코얼레서용)
+        
+        모든 요청의 항목을 이어 붙여 임팩트/차단 여부를 NumPy로 한 번에 계산하고,
+        요청별로 _execute_cosmos_logic과 같은 형태의 결과를 만들어 반환합니다.
+        """
+        flat = [item for input_data in inputs for item in input_data]
+        is_num = np.fromiter((isinstance(item, (int, float)) for item in flat), dtype=bool, count=len(flat))
+        values = np.fromiter((float(item) if ok else 0.0 for item, ok in zip(flat, is_num)),
+                             dtype=float, count=len(flat))
+        with np.errstate(invalid='ignore'):
+            scaled = np.nan_to_num(np.abs(values) / 10.0, nan=1.0, posinf=1.0)
+        impacts = np.where(is_num, np.minimum(1.0, scaled), 0.5)
+        blocked = impacts >= self.threshold
+        
+        results = []
+        offset = 0
+        for input_data in inputs:
+            n = len(input_data)
+            timestamp = datetime.now().isoformat()
+            execution_path = []
+            for i, item in enumerate(input_data):
+                layer_num = (i % 7) + 1
+                layer_name = self.layers[layer_num]
+                is_blocked = bool(blocked[offset + i])
+                execution_path.append({
+                    'step': i + 1,
+                    'layer': layer_name,
+                    'layer_number': layer_num,
+                    'impact': float(impacts[offset + i]),
+                    'threshold': self.threshold,
+                    'status': 'BLOCKED' if is_blocked else 'PASSED',
+                    'blocked': is_blocked,
+                    'codon': self._generate_codon_for_item(item, layer_num),
+                    'rule': f"rule_{group}_{layer_name.lower()}",
+                    'timestamp': timestamp
+                })
+            total_impact = float(impacts[offset:offset + n].sum())
+            metrics = {
+                'total_impact': total_impact,
+                'average_impact': total_impact / n if n else 0,
+                'blocked_count': int(blocked[offset:offset + n].sum()),
+                'cascade_depth': self._calculate_cascade_depth(execution_path),
+                'execution_path': execution_path
+            }
+            results.append({
+                'execution_id': next_execution_id(),
+                'group': group,
+                'profile': profile,
+                'input': input_data,
+                'metrics': metrics,
+                'mode': self.current_mode,
+                'timestamp': timestamp,
+                'status': 'completed',
+                'batch_size': len(inputs)
+            })
+            offset += n
+        
+        self.execution_history.extend(results)
+        if len(self.execution_history) > 100:  # 최대 100개 유지
+            del self.execution_history[:-100]
+        
+        return results
+    
+    def enable_coalescing(self, window_ms: float = 2.0, max_items: int = 256, timeout_s: float = 5.0):
+        """
+        /api/cosmos/execute 요청 묶음 처리 활성화
+        
+        Args:
+            window_ms: 같은 group/profile 요청을 모으는 시간 (밀리초)
+            max_items: 배치를 즉시 실행할 입력 항목 수
+            timeout_s: 요청별 대기 한도 (초, 요청의 options.timeout_s는 이 값 이하로만 줄일 수 있음)
+        """
+        self.disable_coalescing()
+        self.coalescer = RequestCoalescer(self._execute_cosmos_logic_batch, window_ms, max_items, timeout_s)
+    
+    def disable_coalescing(self):
+        """요청 묶음 처리 비활성화"""
+        if self.coalescer is not None:
+            self.coalescer.close()
+            self.coalescer = None
+    
     def _generate_codon_for_item(self, item: Any, layer_num: int) -> str:
         """아이템과 계층에 기반한 코돈 생성"""
         # 간단한 해시 기반 코돈 생성
@@ -1163,11 +1262,17 @@ def main():
                        help='프론트엔드 포트')
     parser.add_argument('--debug', action='store_true', 
                        help='디버그 모드')
+    parser.add_argument('--coalesce-ms', type=float, default=0.0,
+                       help='요청 묶음 처리 창 (밀리초, 0이면 끔)')
+    parser.add_argument('--coalesce-items', type=int, default=256,
+                       help='배치를 즉시 실행할 입력 항목 수')
     
     args = parser.parse_args()
     
     # COSMOS 시스템 초기화
     cosmos = CosmosIntegrationSystem("cosmos-hgp-demo")
+    if args.coalesce_ms > 0:
+        cosmos.enable_coalescing(args.coalesce_ms, args.coalesce_items)
     
     if args.mode == 'backend':
         cosmos.start_backend(args.backend_port, args.debug)
@@ -54,6 +54,7 @@ try:
         CosmosPROEngine, Rule, RuleGroup, VelocityConfig,
         Layer, DualityMode, FlowDirection
     )
+    from engine_pool import EnginePool
     ENGINE_AVAILABLE = True
 except ImportError:
     ENGINE_AVAILABLE = False
@@ -112,7 +113,7 @@ velocity_manager = None
 codon_registry = None
 predictor = None
 annotation_system = None
-pro_engine = None
+engine_pool = None
 
 if CORE_MODULES_AVAILABLE:
     velocity_manager = VelocityPolicyManager()
@@ -133,11 +134,21 @@ if ENGINE_AVAILABLE:
     config = VelocityConfig()
     
     try:
-        pro_engine = CosmosPROEngine(rules, groups, config)
-        print("✅ PRO Engine initialized")
+        # 테넌트(API 키)별 엔진: 첫 요청 때 생성, 유휴 10분/최대 256개/추정 256MB 초과 시 LRU 축출
+        # velocity_manager를 공유해 /pro/threshold/adjust 등의 임계값 변경이 모든 테넌트 엔진에 반영되게 함
+        engine_pool = EnginePool(rules, groups, config, max_engines=256, max_bytes=256 << 20,
+                                 idle_ttl=600.0, history_limit=200, velocity_policy=velocity_manager)
+        print("✅ PRO Engine pool initialized")
     except Exception as e:
         print(f"⚠️  PRO Engine init failed: {e}")
 
+
+def get_engine(api_key: Optional[str]) -> "CosmosPROEngine":
+    """요청한 테넌트의 엔진 (인증 모듈이 없으면 공용 'anonymous' 테넌트)"""
+    if not engine_pool:
+        raise HTTPException(503, "PRO Engine not available")
+    return engine_pool.get(api_key or "anonymous")
+
 # === Rate Limit Middleware ===
 @app.middleware("http")
 async def rate_limit_middleware(request: Request, call_next):
@@ -198,7 +209,7 @@ async def health():
     """헬스 체크"""
     return {
         "healthy": True,
-        "engine_status": "nominal" if pro_engine else "unavailable",
+        "engine_status": "nominal" if engine_pool else "unavailable",
         "modules": {
             "auth": AUTH_AVAILABLE,
             "rate_limiter": True,
@@ -308,9 +319,8 @@ async def switch_mode(
     payload: DualityModeInput,
     api_key: str = Depends(verify_api_key) if AUTH_AVAILABLE else None
 ):
-    """PRO: 이중성 모드 전환 (Stability/Innovation/Adaptive)"""
-    if not pro_engine:
-        raise HTTPException(503, "PRO Engine not available")
+    """PRO: 이중성 모드 전환 (Stability/Innovation/Adaptive) — 요청한 테넌트의 엔진에만 적용"""
+    pro_engine = get_engine(api_key)
     
     mode_map = {
         "stability": DualityMode.STABILITY,
@@ -360,8 +370,8 @@ async def get_telemetry(
         "predictor_trained": predictor.is_trained if predictor else False
     }
     
-    if pro_engine:
-        telemetry["engine_status"] = pro_engine.get_comprehensive_status()
+    if engine_pool:
+        telemetry["engine_status"] = get_engine(api_key).get_comprehensive_status()
     
     return telemetry
 
@@ -372,7 +382,8 @@ async def get_stats(
     """PRO: 전체 통계"""
     return {
         "rate_limit": rate_limiter.get_all_usage(),
-        "engine": pro_engine.get_comprehensive_status() if pro_engine else {},
+        "engine": get_engine(api_key).get_comprehensive_status() if engine_pool else {},
+        "engine_pool": engine_pool.stats() if engine_pool else {},
         "modules": {
             "velocity": velocity_manager.get_breach_statistics() if velocity_manager else {},
             "annotation": annotation_system.get_statistics() if annotation_system else {}
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+COSMOS PRO 엔진 벤치마크
+규칙 1회 실행당 오버헤드(ms)를 옵션별로 측정
+
+사용법:
+    python pro/bench_engine.py [--size 1000000] [--repeat 5]
+"""
+
+import os
+import sys
+import argparse
+from time import perf_counter
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cosmos_pro_engine import CosmosPROEngine, Rule, RuleGroup, VelocityConfig, Layer, DualityMode
+
+
+def _identity(x):
+    return x
+
+
+def _engine(fingerprint: str, n_rules: int = 4) -> CosmosPROEngine:
+    rules = [Rule(f"r{i}", _identity, Layer.L2_ATOMIC) for i in range(n_rules)]
+    groups = {"bench": RuleGroup("bench", [r.key for r in rules])}
+    return CosmosPROEngine(rules, groups, VelocityConfig(mode=DualityMode.INNOVATION), fingerprint=fingerprint)
+
+
+def bench_fingerprint(size: int = 1_000_000, repeat: int = 5, n_rules: int = 4) -> Dict[str, float]:
+    """fingerprint 전략별 규칙당 평균 소요 시간(ms). identity 규칙이므로 곧 오버헤드"""
+    data = np.random.default_rng(0).random(size)
+    results = {}
+    for name in ["none", "sampled", "blake2b", "sha256"]:
+        engine = _engine(name, n_rules)
+        engine.execute_top_down("bench", data)  # 워밍업
+        t0 = perf_counter()
+        for _ in range(repeat):
+            engine.execute_top_down("bench", data)
+        results[name] = (perf_counter() - t0) * 1000.0 / (repeat * n_rules)
+    return results
+
+
+def _print_table(title: str, rows: Dict[str, float]) -> None:
+    print(f"\n{title}")
+    print("-" * 40)
+    for name, ms in rows.items():
+        print(f"  {name:<12} {ms:>10.3f} ms/rule")
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="COSMOS PRO engine benchmark")
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    _print_table(f"fingerprint overhead (size={args.size:,})", bench_fingerprint(args.size, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+COSMOS-HGP Execution Checkpoints
+execute_top_down 진행 상태 저장소 (실행 id별, 비실행 형식)
+
+상태는 JSON, payload는 수치 배열이면 .npy 버퍼(allow_pickle=False), 그 외는 JSON으로
+하나의 .npz 파일에 담는다. 불러올 때 코드가 실행될 수 있는 형식(pickle)은 쓰지 않는다.
+"""
+
+import io
+import json
+import os
+import stat
+import tempfile
+import threading
+from hashlib import blake2b
+from time import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+def _numeric(x: Any) -> Optional[np.ndarray]:
+    """수치 ndarray/리스트/튜플이면 연속 배열, 아니면 None"""
+    if not isinstance(x, (np.ndarray, list, tuple)):
+        return None
+    try:
+        a = np.ascontiguousarray(x)
+    except (ValueError, TypeError):
+        return None
+    return a if a.dtype.kind in "biuf" and a.ndim >= 1 else None
+
+
+def input_digest(x: Any) -> Optional[str]:
+    """입력 지문 (수치 배열은 타입/dtype/shape/바이트, 그 외는 정렬된 JSON). 표현할 수 없는 입력은 None"""
+    h = blake2b(digest_size=16)
+    a = _numeric(x)
+    if a is not None:
+        h.update(f"{type(x).__name__}{a.dtype.str}{a.shape}".encode())
+        h.update(a.tobytes())
+    else:
+        try:
+            h.update(json.dumps(x, sort_keys=True, allow_nan=True).encode("utf-8"))
+        except (TypeError, ValueError):
+            return None
+    return h.hexdigest()
+
+
+def _default_directory() -> str:
+    uid = os.getuid() if hasattr(os, "getuid") else None
+    return os.path.join(tempfile.gettempdir(), "cosmos_checkpoints" + (f"-{uid}" if uid is not None else ""))
+
+
+class CheckpointStore:
+    """
+    실행 id별 execute_top_down 진행 상태(payload, 다음 규칙 위치, 입력 지문, 속도, 지표)를 로컬 디렉터리에 보관.
+    쓰기는 임시 파일 + os.replace로 원자적이며, ttl(초)보다 오래된 체크포인트는 새 실행을 시작할 때 정리한다.
+    directory를 주지 않으면 사용자별 임시 디렉터리를 0o700으로 만들고, 다른 사용자 소유이거나
+    다른 사용자가 쓸 수 있으면 PermissionError로 거부한다.
+    """
+
+    def __init__(self, directory: Optional[str] = None, ttl: float = 86400.0):
+        self.private = directory is None
+        self.directory = directory or _default_directory()
+        self.ttl = ttl
+        self._checked = False
+
+    def _ensure_directory(self, create: bool) -> bool:
+        if self._checked:
+            return True
+        if not os.path.isdir(self.directory):
+            if not create:
+                return False
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        if self.private:
+            st = os.lstat(self.directory)
+            foreign = hasattr(os, "getuid") and st.st_uid != os.getuid()
+            if not stat.S_ISDIR(st.st_mode) or foreign or st.st_mode & 0o077:
+                raise PermissionError(f"checkpoint directory is not private to the current user: {self.directory}")
+        self._checked = True
+        return True
+
+    def path(self, execution_id: str) -> str:
+        return os.path.join(self.directory, blake2b(execution_id.encode("utf-8"), digest_size=16).hexdigest() + ".ckpt")
+
+    def save(self, execution_id: str, state: Dict[str, Any]) -> bool:
+        """state["payload"]는 수치 배열 또는 JSON 값이어야 함. 표현할 수 없으면 저장하지 않고 False"""
+        state = dict(state)
+        payload = state.pop("payload", None)
+        arr = _numeric(payload)
+        arrays: Dict[str, np.ndarray] = {}
+        if arr is not None:
+            state["payload_kind"] = "ndarray" if isinstance(payload, np.ndarray) else "list"
+            arrays["payload"] = arr
+        else:
+            state["payload_kind"] = "json"
+            state["payload"] = payload
+        try:
+            head = json.dumps(state, allow_nan=True).encode("utf-8")
+        except (TypeError, ValueError):
+            return False
+        self._ensure_directory(create=True)
+        buf = io.BytesIO()
+        np.savez(buf, state=np.frombuffer(head, dtype=np.uint8), **arrays)
+        p = self.path(execution_id)
+        tmp = f"{p}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(buf.getvalue())
+        os.replace(tmp, p)
+        return True
+
+    def load(self, execution_id: str) -> Optional[Dict[str, Any]]:
+        if not self._ensure_directory(create=False):
+            return None
+        try:
+            with np.load(self.path(execution_id), allow_pickle=False) as z:
+                state = json.loads(z["state"].tobytes().decode("utf-8"))
+                kind = state.pop("payload_kind")
+                if kind != "json":
+                    payload = z["payload"]
+                    state["payload"] = payload if kind == "ndarray" else payload.tolist()
+            return state
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self.delete(execution_id)  # 손상된 체크포인트는 버리고 처음부터
+            return None
+
+    def delete(self, execution_id: str) -> None:
+        try:
+            os.remove(self.path(execution_id))
+        except FileNotFoundError:
+            pass
+
+    def prune(self) -> int:
+        if not os.path.isdir(self.directory):
+            return 0
+        cutoff = time() - self.ttl
+        n = 0
+        for name in os.listdir(self.directory):
+            p = os.path.join(self.directory, name)
+            try:
+                if (name.endswith(".ckpt") or name.endswith(".tmp")) and os.path.getmtime(p) < cutoff:
+                    os.remove(p)
+                    n += 1
+            except OSError:
+                pass
+        return n
@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 from __future__ import annotations
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from enum import Enum, auto
-from typing import Any, Callable, Dict, List, Literal, Optional, Protocol, Tuple, Union
-from time import perf_counter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Literal, Optional, Protocol, Tuple, Union
+from time import monotonic, perf_counter, time
+from collections import OrderedDict, deque
 from datetime import datetime
-from hashlib import sha256
-import json, math, os
+from hashlib import sha256, blake2b
+import asyncio, copy, gzip, json, math, os, heapq, threading
+from multiprocessing import shared_memory
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor, BrokenExecutor, FIRST_COMPLETED, wait
+from concurrent.futures import TimeoutError as FutureTimeout
 try:
     import numpy as np
 except Exception:
@@ -24,6 +28,42 @@ try:
 except Exception:
     _ext_threshold=_ext_velocity=_ext_cumulative=None
 
+try:
+    from core_modules.velocity import CumulativeVelocityAccumulator as _Accumulator
+except Exception:
+    class _Accumulator:  # type: ignore
+        """core_modules 부재 시 최소 폴백: log 공간 누적 속도 (add/merge/subtract/value)"""
+        def __init__(self, velocities:Optional[List[float]]=None):
+            self.log_sum=0.0; self.saturated=0; self.count=0
+            if velocities: self.add_many(velocities)
+        def add_many(self, vs:List[float])->int:
+            n=0
+            for v in vs:
+                if isinstance(v,(int,float)) and math.isfinite(v):
+                    v=max(0.0,min(1.0,float(v))); n+=1
+                    if v>=1.0: self.saturated+=1
+                    else: self.log_sum+=math.log1p(-v)
+            self.count+=n; return n
+        def add(self, v:float)->bool: return self.add_many([v])==1
+        def merge(self, o)->"_Accumulator": self.log_sum+=o.log_sum; self.saturated+=o.saturated; self.count+=o.count; return self
+        def subtract(self, o)->"_Accumulator": self.log_sum-=o.log_sum; self.saturated-=o.saturated; self.count-=o.count; return self
+        def value(self, cap:Optional[float]=None)->float:
+            if self.count<=0: return 0.0
+            c=1.0 if self.saturated>0 else max(0.0,min(1.0,-math.expm1(self.log_sum)))
+            return min(c,cap) if cap is not None else c
+
+try:
+    from core_modules.velocity import ThresholdTable as _ThresholdTable, VelocityPolicyManager as _VelocityPolicyManager
+except Exception:
+    _ThresholdTable=_VelocityPolicyManager=None  # 폴백: 엔진이 모드별 행을 직접 계산(_effective_threshold)
+
+try:
+    from .recorder import ExecutionRecorder, read_capture
+    from .checkpoint import CheckpointStore, input_digest as _input_digest
+except ImportError:
+    from recorder import ExecutionRecorder, read_capture
+    from checkpoint import CheckpointStore, input_digest as _input_digest
+
 try:
     from core_modules.codon import (
         analyze_python_code as _ext_analyze,
@@ -53,7 +93,13 @@ class FlowDirection(Enum):
     TOP_DOWN=auto(); BOTTOM_UP=auto(); BIDIRECTIONAL=auto()
 
 class ExecutionStatus(Enum):
-    PENDING="pending"; RUNNING="running"; SUCCESS="success"; BLOCKED="blocked"; FAILED="failed"
+    PENDING="pending"; RUNNING="running"; SUCCESS="success"; BLOCKED="blocked"; FAILED="failed"; TIMEOUT="timeout"
+
+class RuleTimeout(TimeoutError):
+    """규칙 제한 시간(metadata["timeout"]/rule_timeout) 또는 그룹 마감(deadline) 초과"""
+
+# 컬럼형 결과용 상태 코드 (list(ExecutionStatus) 인덱스)
+_STATUS_CODE={s:i for i,s in enumerate(ExecutionStatus)}
 
 @dataclass
 class VelocityConfig:
@@ -62,6 +108,7 @@ class VelocityConfig:
     cumulative_cap: float = 0.50
     butterfly_factor: float = 1.0
     layer_multipliers: Dict[Layer,float]=field(default_factory=dict)
+    profile: Optional[str] = None  # 임계값 표의 프로파일 축. None이면 velocity_policy의 현재 프로파일(없으면 standard)
 
 @dataclass
 class CodonAnalysisResult:
@@ -79,7 +126,7 @@ class PredictionResult:
 class ExecutionMetrics:
     rule_key: str; layer: Layer; start_time: float; end_time: float; duration_ms: float
     velocity: float; threshold: float; status: ExecutionStatus; input_hash: str; output_hash: str
-    error: Optional[str]=None
+    error: Optional[str]=None; cached: bool=False; timed_out: bool=False
 
 @dataclass
 class AnnotationEvent:
@@ -112,28 +159,86 @@ class Rule:
     key:str; function:Callable[[Any],Any]; layer:Layer
     threshold: Optional[float]=None; dependencies: List[str]=field(default_factory=list)
     fallback_rule: Optional[str]=None; is_critical: bool=False; metadata: Dict[str,Any]=field(default_factory=dict)
+    cache_ttl: float=0.0  # >0이면 순수 규칙으로 보고 입력 지문 기준으로 출력을 메모이즈(초)
+    timeout_seconds: Optional[float]=None  # 규칙 제한 시간(초). ExtendedRule.timeout_seconds와 같은 의미, metadata["timeout"]이 우선
 
 @dataclass
 class RuleGroup:
     name:str; structure:List[Union[str,List]]; metadata:Dict[str,Any]=field(default_factory=dict)
 
+@dataclass(frozen=True)
+class ExecutionPlan:
+    """RuleGroup을 (모드, 규칙 버전) 기준으로 한 번 컴파일한 불변 실행 계획"""
+    group:str; mode:DualityMode; signature:Tuple
+    rules:Tuple[Rule,...]; thresholds:Tuple[float,...]; fallbacks:Tuple[Optional[Rule],...]
+    skipped:Tuple[str,...]=()
+    parents:Tuple[Tuple[int,...],...]=()
+
 # ========= 유틸 =========
 _CODONS=[a+b+c for a in "ATGC" for b in "ATGC" for c in "ATGC"]
 def _sh(obj:Any)->str: 
     try: return sha256(repr(obj).encode("utf-8")).hexdigest()[:16]
     except Exception: return sha256(str(obj).encode("utf-8")).hexdigest()[:16]
+# ---- 지문(fingerprint) 전략: input_hash/output_hash 생성 ----
+_FP_SAMPLE_LIMIT=1<<16
+def _fp_sha256(x:Any)->str:
+    """기존 방식: sha256(repr(list)) — 느리지만 이전 해시값과 호환"""
+    return _sh(_to_np(x).tolist())
+def _fp_blake2b(x:Any, limit:Optional[int]=None)->str:
+    """ndarray 원시 버퍼를 blake2b로 해시. limit 지정 시 큰 배열은 균등 간격 표본만 해시"""
+    a=x if isinstance(x,np.ndarray) else _to_np(x)
+    if a.dtype==object: return _sh(a.tolist())
+    h=blake2b(digest_size=8); h.update(f"{a.dtype.str}{a.shape}".encode())
+    if limit and a.size>limit:
+        flat=a.reshape(-1); a=flat[::-(-a.size//limit)]; h.update(flat[-1:].tobytes())
+    h.update(np.ascontiguousarray(a).data)
+    return h.hexdigest()
+def _fp_sampled(x:Any)->str: return _fp_blake2b(x,_FP_SAMPLE_LIMIT)
+def _fp_none(x:Any)->str: return ""
+_FINGERPRINTS:Dict[str,Callable[[Any],str]]={"sha256":_fp_sha256,"blake2b":_fp_blake2b,"sampled":_fp_sampled,"none":_fp_none}
+
 def _to_np(x:Any)->np.ndarray:
     try:
+        if isinstance(x,np.ndarray): return np.asarray(x,dtype=float)  # float64이면 복사 없음
         if isinstance(x,(list,tuple)): return np.array(x,dtype=float)
         if hasattr(x,"__iter__") and not isinstance(x,(str,bytes)): return np.array(list(x),dtype=float)
         return np.array([x],dtype=float)
     except Exception: return np.array([0.0],dtype=float)
 
+class _Carrier:
+    """
+    규칙 사이를 오가는 payload와 그 ndarray 뷰. 뷰는 처음 요청될 때 한 번만 만들어 재사용하며
+    ndarray payload는 복사하지 않는다(입력을 제자리 수정하는 규칙은 metadata["inplace"]=True).
+    """
+    __slots__=("payload","_arr")
+    def __init__(self, payload:Any, arr:Optional[np.ndarray]=None): self.payload=payload; self._arr=arr
+    @property
+    def array(self)->np.ndarray:
+        if self._arr is None: self._arr=_to_np(self.payload)
+        return self._arr
+
+def _detached(cur:_Carrier)->_Carrier:
+    """시간 초과로 버린 스레드가 계속 건드릴 수 있는 payload의 사본 (폴백/이후 규칙 입력용)"""
+    p=cur.payload
+    try: return _Carrier(p.copy() if isinstance(p,np.ndarray) else copy.deepcopy(p))
+    except Exception: return cur
+
+_WATCHDOG_WORKERS=64
+
+def _pool_key(kind:str,max_workers:Optional[int])->str:
+    return kind if max_workers is None else f"{kind}-{max_workers}"
+
 def _mode_mult(mode:DualityMode,bf:float)->float:
     if mode is DualityMode.STABILITY: return 0.7
     if mode is DualityMode.INNOVATION: return 2.2
     return max(0.6,min(1.6,1.0 + 0.5*(bf-1.0)))
 
+def _effective_threshold(layer:Layer,mode:DualityMode,c:VelocityConfig)->float:
+    """임계값 표가 없을 때(core_modules 부재) 쓰는 원래 계산식"""
+    base=_ext_threshold(layer) if _ext_threshold else layer.base_threshold
+    eff=max(0.0,min(1.0, base*_mode_mult(mode,c.butterfly_factor)*c.layer_multipliers.get(layer,1.0)))
+    return max(0.0,min(1.0, eff if eff>0 else c.base_threshold))
+
 def _simple_velocity(before:np.ndarray,after:np.ndarray)->float:
     try:
         b=before.astype(float); a=after.astype(float)
@@ -144,6 +249,62 @@ def _simple_velocity(before:np.ndarray,after:np.ndarray)->float:
         return max(0.0,min(1.0,v))
     except Exception: return 0.0
 
+def _simple_velocity_rows(before:np.ndarray,after:np.ndarray)->np.ndarray:
+    """_simple_velocity의 행 단위 벡터화 버전 (N,D) x (N,D') -> (N,)"""
+    m=min(before.shape[1],after.shape[1]); b=before[:,:m]; a=after[:,:m]
+    num=np.linalg.norm(a-b,axis=1); den=np.linalg.norm(b,axis=1)+1e-9
+    v=1.0-np.exp(-num/(den+1e-9))
+    return np.where(np.isnan(v),1.0,np.clip(v,0.0,1.0))
+
+def _stack_rows(rows:List[Any])->Optional[np.ndarray]:
+    """행 payload 목록을 (N,D) 행렬로. 모양이 다르면 None"""
+    try:
+        arrs=[_to_np(r).ravel() for r in rows]
+        if len({a.shape for a in arrs})>1: return None
+        return np.stack(arrs) if arrs else np.zeros((0,1))
+    except Exception: return None
+
+def _call_rule(fn:Callable[[Any],Any], fb:Optional[Callable[[Any],Any]], data:Any)->Tuple[Any,Optional[str],str]:
+    """풀 워커에서 규칙(+폴백) 실행 -> (출력, 오류, "ok"|"fallback"|"failed")"""
+    try: return fn(data), None, "ok"
+    except Exception as e:
+        err=str(e)
+        if fb is not None:
+            try: return fb(data), err, "fallback"
+            except Exception as e2: err=f"{err}; fallback:{e2}"
+        return None, err, "failed"
+
+def _shm_call(fn:Callable[[Any],Any], name:str, shape:Tuple[int,...], dtype:str)->Tuple[str,Any]:
+    """
+    프로세스 워커: 공유 메모리 입력 블록을 ndarray로 붙여 규칙 실행. 수치 ndarray 출력은 새 공유 블록에
+    기록해 ("shm", 이름, 모양, dtype)으로, 그 외 출력은 ("obj", 값)으로 반환한다. 블록 해제는 부모 몫.
+    """
+    shm=shared_memory.SharedMemory(name=name)
+    try:
+        x=np.ndarray(shape,dtype=np.dtype(dtype),buffer=shm.buf)
+        out=fn(x)
+        if isinstance(out,np.ndarray) and out.dtype.kind in "biuf":
+            blk=shared_memory.SharedMemory(create=True,size=max(1,out.nbytes))
+            np.ndarray(out.shape,dtype=out.dtype,buffer=blk.buf)[...]=out
+            res=("shm",(blk.name,out.shape,out.dtype.str)); blk.close(); del out
+        else: res=("obj",out)
+        del x
+        return res
+    finally:
+        try: shm.close()
+        except BufferError: pass  # 예외 traceback이 뷰를 잡고 있는 경우 — 워커 종료 시 정리됨
+
+def _flat_metric(m:Dict[str,Any])->Dict[str,Any]:
+    """ExecutionMetrics dict(원본 또는 컬럼 복원)를 내보내기용 스칼라 dict로"""
+    ly=m.get("layer"); st=m.get("status")
+    return {"rule_key":m.get("rule_key",""),"layer":ly.level if isinstance(ly,Layer) else ly,
+            "status":st.value if isinstance(st,ExecutionStatus) else st,"velocity":m.get("velocity"),
+            "threshold":m.get("threshold"),"duration_ms":m.get("duration_ms"),"cached":bool(m.get("cached")),"error":m.get("error")}
+
+def _reusable(rule:Rule)->bool:
+    """같은 입력이면 같은 출력을 낸다고 볼 수 있는 규칙(양방향 재사용 대상)"""
+    return not rule.metadata.get("inplace") and rule.metadata.get("pure",True)
+
 def _cumulative(vs:List[float])->float:
     p=1.0
     for v in vs: p*= (1.0 - max(0.0,min(1.0,v)))
@@ -154,7 +315,7 @@ def _risk_level(p:float)->str:
 
 # ========= 기본 모니터/예측 폴백 =========
 class _LocalMonitor:
-    def __init__(self): self.buf:List[AnnotationEvent]=[]
+    def __init__(self, limit:int=10000): self.buf:deque=deque(maxlen=limit)
     def record_event(self,event:AnnotationEvent)->None: self.buf.append(event)
     def get_statistics(self)->Dict[str,Any]:
         by_level={k:0 for k in ["DEBUG","INFO","WARNING","ERROR","CRITICAL"]}
@@ -174,6 +335,246 @@ class _HeuristicPredictor:
         pr=self.predict_cascade(input_data,"_")
         return {"p":pr.cascade_probability,"risk":pr.risk_level}
 
+# ========= 규칙 출력 메모 캐시 (LRU + TTL) =========
+class RuleMemoCache:
+    """
+    (규칙 키, 입력 지문) -> (출력, 출력 ndarray, 속도). 항목 수와 출력 바이트 합으로 제한되는 LRU이며
+    항목은 규칙의 cache_ttl이 지나면 만료된다. 캐시된 출력은 호출 간에 공유되므로 규칙은 순수해야 한다.
+    """
+    def __init__(self, max_entries:int=1024, max_bytes:int=64<<20):
+        self.max_entries=max_entries; self.max_bytes=max_bytes
+        self._d:OrderedDict=OrderedDict(); self.bytes=0
+        self.hits=self.misses=self.evictions=self.expired=0
+
+    @staticmethod
+    def key(rule:Rule, cur:_Carrier)->Optional[Tuple[str,str,str]]:
+        p=cur.payload
+        # 수치 배열로 그대로 표현되지 않는 입력(문자열/dict/비정형 리스트 등)은 _to_np가 [0.0]으로 뭉개므로 캐시하지 않음
+        if isinstance(p,np.ndarray): ok=p.dtype.kind in "biuf"
+        elif isinstance(p,(list,tuple)):
+            try: ok=np.asarray(p).dtype.kind in "biuf"
+            except (ValueError,TypeError): ok=False
+        else: ok=isinstance(p,(int,float))
+        if not ok: return None
+        a=cur.array; h=blake2b(digest_size=16); h.update(f"{a.dtype.str}{a.shape}".encode()); h.update(np.ascontiguousarray(a).data)
+        return (rule.key, type(p).__name__, h.hexdigest())
+
+    def get(self, k:Tuple)->Optional[Tuple[_Carrier,float]]:
+        ent=self._d.get(k)
+        if ent is None: self.misses+=1; return None
+        exp,nb,payload,arr,v=ent
+        if exp<monotonic():
+            del self._d[k]; self.bytes-=nb; self.expired+=1; self.misses+=1; return None
+        self._d.move_to_end(k); self.hits+=1
+        return _Carrier(payload,arr), v
+
+    def put(self, k:Tuple, ttl:float, out:_Carrier, v:float)->None:
+        nb=int(out.array.nbytes)
+        if nb>self.max_bytes: return
+        old=self._d.pop(k,None)
+        if old is not None: self.bytes-=old[1]
+        self._d[k]=(monotonic()+ttl,nb,out.payload,out.array,v); self.bytes+=nb
+        while self._d and (len(self._d)>self.max_entries or self.bytes>self.max_bytes):
+            _,ent=self._d.popitem(last=False); self.bytes-=ent[1]; self.evictions+=1
+
+    def clear(self)->None: self._d.clear(); self.bytes=0
+
+    def stats(self)->Dict[str,Any]:
+        total=self.hits+self.misses
+        return {"entries":len(self._d),"bytes":self.bytes,"hits":self.hits,"misses":self.misses,
+                "hit_rate":self.hits/total if total else 0.0,"evictions":self.evictions,"expired":self.expired}
+
+# ========= 예측/코돈 결과 캐시 =========
+class AnalysisCache:
+    """
+    입력 지문 -> PredictionResult/CodonAnalysisResult. 항목 수로 제한되는 LRU이며 ttl(초)을 주면 만료된다.
+    결과 객체는 호출 간에 공유되므로 응답에는 __dict__의 사본을 싣는다.
+    """
+    def __init__(self, max_entries:int=512, ttl:Optional[float]=None):
+        self.max_entries=max_entries; self.ttl=ttl
+        self._d:OrderedDict=OrderedDict(); self.hits=self.misses=self.evictions=0
+
+    @staticmethod
+    def key(*parts:Any, data:Union[np.ndarray,str,bytes], decimals:Optional[int]=None)->Tuple:
+        h=blake2b(digest_size=16)
+        if isinstance(data,np.ndarray):
+            a=np.round(data,decimals) if decimals is not None else data  # 근사 입력을 같은 항목으로 묶음
+            h.update(f"{a.dtype.str}{a.shape}".encode()); h.update(np.ascontiguousarray(a).data)
+        else: h.update(data.encode() if isinstance(data,str) else data)
+        return (*parts, h.hexdigest())
+
+    def get(self, k:Tuple)->Any:
+        ent=self._d.get(k)
+        if ent is None or (ent[0] is not None and ent[0]<monotonic()):
+            if ent is not None: del self._d[k]
+            self.misses+=1; return None
+        self._d.move_to_end(k); self.hits+=1; return ent[1]
+
+    def put(self, k:Tuple, value:Any)->None:
+        self._d[k]=(monotonic()+self.ttl if self.ttl else None, value); self._d.move_to_end(k)
+        while len(self._d)>self.max_entries: self._d.popitem(last=False); self.evictions+=1
+
+    def clear(self)->None: self._d.clear()
+
+    def stats(self)->Dict[str,Any]:
+        total=self.hits+self.misses
+        return {"entries":len(self._d),"hits":self.hits,"misses":self.misses,
+                "hit_rate":self.hits/total if total else 0.0,"evictions":self.evictions}
+
+class IntegrationResult(dict):
+    """codon="lazy" 통합 결과: "codon_analysis"를 처음 읽을 때 분석한다(읽지 않으면 직렬화에서도 빠짐)"""
+    def __init__(self, data:Dict[str,Any], codon:Callable[[],Optional[Dict[str,Any]]]):
+        super().__init__(data); self._codon:Optional[Callable]=codon
+    def _load(self)->None:
+        if self._codon is not None:
+            fn=self._codon; self._codon=None; dict.__setitem__(self,"codon_analysis",fn())
+    def __missing__(self, k:str)->Any:
+        if k!="codon_analysis" or self._codon is None: raise KeyError(k)
+        self._load(); return dict.__getitem__(self,k)
+    def get(self, k:str, default:Any=None)->Any:
+        if k=="codon_analysis": self._load()
+        return dict.get(self,k,default)
+    def __contains__(self, k:object)->bool: return (k=="codon_analysis" and self._codon is not None) or dict.__contains__(self,k)
+
+# ========= 규칙별 지연 프로파일 =========
+class RuleProfiler:
+    """
+    규칙별 스트리밍 지연 히스토그램. 1µs부터 2^(1/4) 배율의 로그 버킷 카운터만 유지하므로
+    규칙당 메모리가 고정이며 p50/p90/p99는 버킷 상한(약 ±9%)으로 근사한다.
+    """
+    BASE_MS=1e-3; PER_OCTAVE=4; BUCKETS=128
+    def __init__(self):
+        self._rules:Dict[str,Dict[str,Any]]={}
+        self._edges=self.BASE_MS*2.0**(np.arange(1,self.BUCKETS+1)/self.PER_OCTAVE)
+
+    def _bucket(self, ms:float)->int:
+        if ms<=self.BASE_MS: return 0
+        return min(self.BUCKETS-1,int(math.log2(ms/self.BASE_MS)*self.PER_OCTAVE))
+
+    def observe(self, key:str, duration_ms:float, rows:int=1, blocked:int=0, failed:int=0, cached:int=0, timeouts:int=0)->None:
+        """rows>1이면 배치 한 번을 행당 평균 지연의 rows개 표본으로 기록"""
+        r=self._rules.get(key)
+        if r is None:
+            r=self._rules[key]={"counts":np.zeros(self.BUCKETS,dtype=np.int64),"calls":0,"total_ms":0.0,"max_ms":0.0,"blocked":0,"failed":0,"cached":0,"timeouts":0}
+        per=duration_ms/max(1,rows)
+        r["counts"][self._bucket(per)]+=rows; r["calls"]+=rows; r["total_ms"]+=duration_ms
+        r["max_ms"]=max(r["max_ms"],per); r["blocked"]+=blocked; r["failed"]+=failed; r["cached"]+=cached; r["timeouts"]+=timeouts
+
+    def observe_metric(self, met:ExecutionMetrics)->None:
+        self.observe(met.rule_key, met.duration_ms, 1, int(met.status is ExecutionStatus.BLOCKED),
+                     int(met.status is ExecutionStatus.FAILED), int(met.cached), int(met.timed_out))
+
+    def quantile(self, key:str, q:float)->float:
+        r=self._rules.get(key)
+        if not r or not r["calls"]: return 0.0
+        i=int(np.searchsorted(np.cumsum(r["counts"]),q*r["calls"]))
+        return float(min(self._edges[min(i,self.BUCKETS-1)],r["max_ms"]))
+
+    def summary(self, key:str)->Dict[str,Any]:
+        r=self._rules[key]; n=r["calls"]
+        return {"rule_key":key,"calls":n,"total_ms":r["total_ms"],"mean_ms":r["total_ms"]/n if n else 0.0,
+                "p50_ms":self.quantile(key,0.5),"p90_ms":self.quantile(key,0.9),"p99_ms":self.quantile(key,0.99),
+                "max_ms":r["max_ms"],"block_rate":r["blocked"]/n if n else 0.0,"failure_rate":r["failed"]/n if n else 0.0,
+                "cache_hits":r["cached"],"timeouts":r["timeouts"],"timeout_rate":r["timeouts"]/n if n else 0.0}
+
+    def top(self, n:Optional[int]=10)->List[Dict[str,Any]]:
+        keys=sorted(self._rules,key=lambda k:self._rules[k]["total_ms"],reverse=True)
+        return [self.summary(k) for k in keys[:n]]
+
+    def clear(self)->None: self._rules.clear()
+
+# ========= 실행 이력 (고정 용량, 컬럼형) =========
+class ExecutionHistory:
+    """
+    실행 결과의 링 버퍼. 실행 단위(성공/누적속도/시각)와 규칙 단위(소요시간/속도/임계값/상태/레이어)
+    수치 컬럼을 미리 할당된 배열에 보관하고, 전체 결과 dict는 keep_payloads=True일 때만 보관한다.
+    """
+    def __init__(self, capacity:int=1000, metric_capacity:Optional[int]=None, keep_payloads:bool=False):
+        if capacity<=0: raise ValueError("capacity must be positive")
+        self.capacity=capacity; self.metric_capacity=mc=metric_capacity or capacity*16
+        self.timestamp=np.zeros(capacity); self.success=np.zeros(capacity,dtype=bool)
+        self.predictor_blocked=np.zeros(capacity,dtype=bool); self.cumulative_velocity=np.zeros(capacity)
+        self.metric_start=np.zeros(capacity,dtype=np.int64); self.metric_count=np.zeros(capacity,dtype=np.int32)
+        self.duration_ms=np.zeros(mc); self.velocity=np.zeros(mc); self.threshold=np.zeros(mc)
+        self.status=np.zeros(mc,dtype=np.int8); self.layer=np.zeros(mc,dtype=np.int8); self.rule_id=np.zeros(mc,dtype=np.int32)
+        self.keep_payloads=keep_payloads; self._payloads:deque=deque(maxlen=capacity)
+        self._rule_ids:Dict[str,int]={}; self._rule_keys:List[str]=[]
+        self.total=0; self.metric_total=0
+
+    def __len__(self)->int: return min(self.total,self.capacity)
+    def __iter__(self): return (self.record(i) for i in range(len(self)))
+
+    def append(self, result:Dict[str,Any])->None:
+        slot=self.total%self.capacity; mets=self._metrics_of(result); mc=self.metric_capacity
+        self.timestamp[slot]=time(); self.success[slot]=bool(result.get("success"))
+        self.predictor_blocked[slot]=bool(result.get("blocked_by_predictor"))
+        self.cumulative_velocity[slot]=float(result.get("cumulative_velocity") or 0.0)
+        self.metric_start[slot]=self.metric_total; self.metric_count[slot]=len(mets)
+        for m in mets:
+            j=self.metric_total%mc; key=m.get("rule_key","")
+            rid=self._rule_ids.get(key)
+            if rid is None: rid=self._rule_ids[key]=len(self._rule_keys); self._rule_keys.append(key)
+            st=m.get("status"); ly=m.get("layer")
+            self.duration_ms[j]=m.get("duration_ms",0.0); self.velocity[j]=m.get("velocity",0.0); self.threshold[j]=m.get("threshold",0.0)
+            self.status[j]=_STATUS_CODE.get(st,0) if isinstance(st,ExecutionStatus) else 0
+            self.layer[j]=ly.level if isinstance(ly,Layer) else 0; self.rule_id[j]=rid
+            self.metric_total+=1
+        if self.keep_payloads: self._payloads.append(result)
+        self.total+=1
+
+    def record(self, i:int)->Dict[str,Any]:
+        """보관 중인 i번째(오래된 순) 실행. payload가 있으면 원본, 없으면 컬럼에서 복원한 요약"""
+        n=len(self)
+        if not -n<=i<n: raise IndexError(i)
+        i%=n
+        if self.keep_payloads: return self._payloads[i]
+        slot=(self.total-n+i)%self.capacity
+        start=int(self.metric_start[slot]); cnt=int(self.metric_count[slot]); lost=max(0,self.metric_total-self.metric_capacity-start)
+        names=[st.value for st in ExecutionStatus]; mets=[]
+        for k in range(start+min(lost,cnt),start+cnt):
+            j=k%self.metric_capacity
+            mets.append({"rule_key":self._rule_keys[self.rule_id[j]],"layer":int(self.layer[j]),"duration_ms":float(self.duration_ms[j]),
+                         "velocity":float(self.velocity[j]),"threshold":float(self.threshold[j]),"status":names[self.status[j]]})
+        out={"success":bool(self.success[slot]),"timestamp":float(self.timestamp[slot]),
+             "cumulative_velocity":float(self.cumulative_velocity[slot]),"metrics":mets}
+        if self.predictor_blocked[slot]: out["blocked_by_predictor"]=True
+        if lost: out["metrics_truncated"]=min(lost,cnt)
+        return out
+
+    def __getitem__(self, i:Union[int,slice])->Union[Dict[str,Any],List[Dict[str,Any]]]:
+        """history[i] 또는 history[-10:]처럼 리스트와 같은 인덱싱/슬라이싱"""
+        if isinstance(i,slice): return [self.record(k) for k in range(*i.indices(len(self)))]
+        return self.record(i)
+
+    def iter_range(self, start:Optional[int]=None, stop:Optional[int]=None, since:Optional[float]=None, until:Optional[float]=None)->Iterator[Tuple[int,float,Dict[str,Any]]]:
+        """
+        보관 중인 실행을 (순번, 시각, 결과)로 지연 순회. 순번은 append 누적 번호(clear 전까지 단조 증가)이며
+        [start, stop) 순번 범위와 [since, until) 시각 범위로 거른다. 결과 dict는 순회 시점에 하나씩 만든다.
+        """
+        n=len(self); first=self.total-n
+        lo=first if start is None else max(first,start); hi=self.total if stop is None else min(self.total,stop)
+        for seq in range(lo,hi):
+            ts=float(self.timestamp[seq%self.capacity])
+            if since is not None and ts<since: continue
+            if until is not None and ts>=until: break  # append 순서 = 시각 순서
+            yield seq, ts, self.record(seq-first)
+
+    def stats(self)->Dict[str,Any]:
+        n=len(self); m=min(self.metric_total,self.metric_capacity)
+        if not n: return {"retained":0,"total":self.total}
+        return {"retained":n,"total":self.total,"success_rate":float(self.success[:n].mean()),
+                "avg_cumulative_velocity":float(self.cumulative_velocity[:n].mean()),
+                "avg_rule_ms":float(self.duration_ms[:m].mean()) if m else 0.0,
+                "max_rule_ms":float(self.duration_ms[:m].max()) if m else 0.0}
+
+    def clear(self)->None:
+        self.total=0; self.metric_total=0; self._payloads.clear()
+
+    @staticmethod
+    def _metrics_of(result:Dict[str,Any])->List[Dict[str,Any]]:
+        if "metrics" in result: return result["metrics"] or []
+        return [m for part in ("top_down","bottom_up") for m in (result.get(part) or {}).get("metrics",[])]
+
 # ========= 메인 엔진 구현 =========
 class CosmosPROEngine:
     def __init__(
@@ -185,18 +586,50 @@ class CosmosPROEngine:
         codon_analyzer: Optional[CodonAnalyzer]=None,
         cascade_predictor: Optional[CascadePredictor]=None,
         execution_monitor: Optional[ExecutionMonitor]=None,
+        fingerprint: Union[str,Callable[[Any],str]]="blake2b",
+        history_limit: int=1000,
+        keep_payloads: bool=False,
+        event_limit: int=10000,
+        memo_max_entries: int=1024,
+        memo_max_bytes: int=64<<20,
+        analysis_cache_size: int=512,
+        analysis_cache_ttl: Optional[float]=None,
+        prediction_cache_decimals: Optional[int]=None,
+        codon_mode: Literal["eager","lazy","off"]="eager",
+        share_config: bool=False,
+        checkpoint_dir: Optional[str]=None,
+        checkpoint_ttl: float=86400.0,
+        rule_timeout: Optional[float]=None,
+        velocity_policy: Optional[Any]=None,
     ):
         self.rules={r.key:r for r in rules}
         self.groups=groups
-        self.config=config
+        self.config=config; self._config_shared=share_config  # True면 첫 설정 변경 때 사본을 만듦(copy-on-write)
         self.current_mode=config.mode
         self.current_direction=FlowDirection.TOP_DOWN
         self.velocity_calculator=velocity_calculator
         self.codon_analyzer=codon_analyzer
         self.cascade_predictor=cascade_predictor or _HeuristicPredictor()
         self.execution_monitor=execution_monitor or _LocalMonitor()
-        self.execution_history:List[Dict[str,Any]]=[]
-        self._events:List[AnnotationEvent]=[]
+        self.execution_history=ExecutionHistory(history_limit, keep_payloads=keep_payloads)
+        self._events:deque=deque(maxlen=event_limit)
+        self._plans:Dict[Tuple,ExecutionPlan]={}; self._plan_sig:Tuple=(); self._rules_version=0
+        self._pools:Dict[str,Executor]={}
+        self.set_fingerprint(fingerprint)
+        self.memo_cache=RuleMemoCache(memo_max_entries,memo_max_bytes)
+        self.profiler=RuleProfiler()
+        self.prediction_cache=AnalysisCache(analysis_cache_size,analysis_cache_ttl)
+        self.codon_cache=AnalysisCache(analysis_cache_size,analysis_cache_ttl)
+        self.prediction_cache_decimals=prediction_cache_decimals; self.codon_mode=codon_mode
+        self.recorder:Optional[ExecutionRecorder]=None
+        self.checkpoints=CheckpointStore(checkpoint_dir,checkpoint_ttl)
+        self.rule_timeout=rule_timeout  # 규칙 기본 제한 시간(초). metadata["timeout"]이 우선
+        self._abandoned:Dict[Future,Executor]={}; self._abandoned_total=0; self._watchdog_retired=0; self._watchdog_lock=threading.Lock()
+        # 프로파일별 임계값의 원본 표(VelocityPolicyManager). 여러 엔진이 같은 관리자를 공유하면 set_threshold/adaptive가 모두에 반영됨
+        if velocity_policy is None and _VelocityPolicyManager is not None: velocity_policy=_VelocityPolicyManager()
+        self.velocity_policy=velocity_policy
+        self._threshold_sig:Tuple=()
+        self._rebuild_thresholds()
 
     # ---- 1. 속도 ----
     def calculate_velocity(self, layer:Layer, before:np.ndarray, after:np.ndarray)->float:
@@ -219,14 +652,49 @@ class CosmosPROEngine:
         return _cumulative(velocities)
 
     def get_effective_threshold(self, layer:Layer, mode:Optional[DualityMode]=None)->float:
-        m=mode or self.current_mode
-        base=_ext_threshold(layer) if _ext_threshold else layer.base_threshold
-        mult=_mode_mult(m,self.config.butterfly_factor)*self.config.layer_multipliers.get(layer,1.0)
-        eff=max(0.0,min(1.0, base*mult))
-        return max(0.0,min(1.0, eff if eff>0 else self.config.base_threshold))
+        return float(self._threshold_rows()[mode or self.current_mode][layer.level])
+
+    def get_effective_thresholds(self, levels:Any, mode:Optional[DualityMode]=None)->np.ndarray:
+        """레이어 레벨 배열의 유효 임계값을 표에서 한 번에 모음"""
+        return self._threshold_rows()[mode or self.current_mode][np.asarray(levels,dtype=np.int64)]
+
+    def _threshold_key(self)->Tuple:
+        """임계값 표를 결정하는 입력: 원본 표(정체성), 프로파일, butterfly, base_threshold, 레이어 배수"""
+        c=self.config; p=self.velocity_policy
+        profile=c.profile or (p.current_profile.name if p is not None else "standard")
+        return (p.threshold_table if p is not None else None, profile, c.butterfly_factor, c.base_threshold,
+                tuple(c.layer_multipliers.items()))
+
+    def _threshold_rows(self)->Dict[DualityMode,np.ndarray]:
+        """현재 설정/원본 표에 맞는 모드별 행 (config를 직접 바꿨거나 관리자가 표를 다시 만들었으면 재구성)"""
+        if self._threshold_key()!=self._threshold_sig: self._rebuild_thresholds()
+        return self._thresholds
+
+    def _rebuild_thresholds(self, table:Optional[Any]=None)->None:
+        """
+        velocity_policy의 공유 표(프로파일 축: 프리셋, set_threshold, adaptive)에 이 엔진의 모드 배수(butterfly),
+        레이어 배수, base_threshold 폴백을 적용한 [profile, mode, level] 표를 만들어 통째로 교체한다.
+        모드/레이어 배수는 엔진(테넌트)별 설정이라 원본 표를 공유하고 배수 적용본만 엔진이 가진다.
+        표는 불변이라 같은 설정의 엔진끼리 공유할 수 있다(table 인자). core_modules가 없으면 표 없이 모드별 행만 계산.
+        """
+        key=self._threshold_key(); source,profile=key[0],key[1]; c=self.config
+        if table is None and source is not None:
+            table=source.scaled({m.name:_mode_mult(m,c.butterfly_factor) for m in DualityMode},
+                                {l.level:v for l,v in c.layer_multipliers.items()},fallback=c.base_threshold)
+        if table is None:
+            if profile!="standard": raise ValueError(f"unknown velocity profile: {profile}")
+            rows={m:np.array([0.0]+[_effective_threshold(l,m,c) for l in Layer]) for m in DualityMode}
+        else:
+            if profile not in table.profiles: raise ValueError(f"unknown velocity profile: {profile}")
+            rows={m:table.row(profile,m.name) for m in DualityMode}
+        self.threshold_table=table; self._thresholds=rows; self._threshold_sig=key
 
     # ---- 2. 코돈 ----
-    def analyze_codon(self, code:str, include_macros:bool=True)->CodonAnalysisResult:
+    def analyze_codon(self, code:str, include_macros:bool=True, use_cache:bool=False)->CodonAnalysisResult:
+        if use_cache:
+            k=AnalysisCache.key(include_macros, data=code); res=self.codon_cache.get(k)
+            if res is None: res=self.analyze_codon(code, include_macros); self.codon_cache.put(k,res)
+            return res
         if self.codon_analyzer: return self.codon_analyzer.analyze_code(code)
         if _ext_analyze:
             try: return _ext_analyze(code)
@@ -258,8 +726,13 @@ class CosmosPROEngine:
         return { "A":Layer.L1_QUANTUM,"T":Layer.L3_MOLECULAR,"G":Layer.L5_ORGANIC,"C":Layer.L7_COSMOS }.get(head,Layer.L1_QUANTUM)
 
     # ---- 3. 예측 ----
-    def predict_cascade(self, input_data:np.ndarray, group_name:str)->PredictionResult:
-        return self.cascade_predictor.predict_cascade(_to_np(input_data), group_name)
+    def predict_cascade(self, input_data:np.ndarray, group_name:str, use_cache:bool=True)->PredictionResult:
+        x=_to_np(input_data)
+        if not use_cache: return self.cascade_predictor.predict_cascade(x, group_name)
+        k=AnalysisCache.key(group_name, data=x, decimals=self.prediction_cache_decimals)
+        pr=self.prediction_cache.get(k)
+        if pr is None: pr=self.cascade_predictor.predict_cascade(x, group_name); self.prediction_cache.put(k,pr)
+        return pr
 
     def predict_and_block(self, input_data:np.ndarray, group_name:str, auto_block:bool=True)->Tuple[bool,PredictionResult]:
         pr=self.predict_cascade(input_data, group_name)
@@ -272,6 +745,7 @@ class CosmosPROEngine:
         try:
             self.cascade_predictor.record_execution(_to_np(execution_result.get("input",[0])), execution_result)
         except Exception: pass
+        self.prediction_cache.clear()  # 모델이 바뀌었으므로 이전 예측은 무효
 
     # ---- 4. 모니터 ----
     def monitor_execution(self, rule_key:str, event_type:str, level:Literal["DEBUG","INFO","WARNING","ERROR","CRITICAL"], message:str, **metadata)->None:
@@ -296,107 +770,435 @@ class CosmosPROEngine:
         self.current_direction=direction
         self._note("direction","INFO",direction.name, rule_key="_system", layer=Layer.L7_COSMOS)
 
-    def execute_top_down(self, group_name:str, input_data:Any)->Dict[str,Any]:
-        grp=self._get_group(group_name); data=input_data; metrics=[]
-        executed=set(); blocked_any=False; velocities=[]
-        for key in self._flatten(grp.structure):
-            rule=self._get_rule(key)
-            if not self._deps_ok(rule, executed): continue
-            before=_to_np(data); t0=perf_counter(); status=ExecutionStatus.RUNNING; err=None
+    def compile_plan(self, group_name:str, mode:Optional[DualityMode]=None)->ExecutionPlan:
+        """그룹 구조를 의존성 순서로 펼치고 규칙/임계값/폴백을 해석한 계획을 캐시에서 반환"""
+        m=mode or self.current_mode; grp=self._get_group(group_name); sig=self._check_plan_signature()
+        key=(group_name,m,id(grp))
+        plan=self._plans.get(key)
+        if plan is None:
+            order=[]; skipped=[]; executed=set()
+            for k in self._flatten(grp.structure):
+                rule=self._get_rule(k)
+                # 실행 시점과 같은 의미: 앞선 규칙이 의존성을 채우지 못하면 건너뜀
+                if self._deps_ok(rule, executed): order.append(rule); executed.add(rule.key)
+                else: skipped.append(rule.key)
+            plan=ExecutionPlan(group_name, m, sig, tuple(order),
+                               tuple(self.get_effective_thresholds([r.layer.level for r in order],m).tolist()),
+                               tuple(self.rules.get(r.fallback_rule) if r.fallback_rule else None for r in order),
+                               tuple(skipped))
+            self._plans[key]=plan
+        return plan
+
+    def compile_dag(self, group_name:str, mode:Optional[DualityMode]=None)->ExecutionPlan:
+        """
+        Rule.dependencies로 DAG를 구성한 계획. 구조 순서를 보존하는 위상 정렬이며
+        parents에 각 규칙의 선행 규칙 인덱스를 담는다. 그룹 밖 의존성이나 순환은 ValueError.
+        """
+        m=mode or self.current_mode; grp=self._get_group(group_name); sig=self._check_plan_signature()
+        key=(group_name,m,id(grp),"dag")
+        plan=self._plans.get(key)
+        if plan is None:
+            keys=list(dict.fromkeys(self._flatten(grp.structure)))
+            rules=[self._get_rule(k) for k in keys]; pos={k:i for i,k in enumerate(keys)}
+            indeg=[0]*len(rules); children:List[List[int]]=[[] for _ in rules]
+            for i,r in enumerate(rules):
+                for d in r.dependencies:
+                    if d not in pos: raise ValueError(f"rule '{r.key}' depends on '{d}' outside group '{group_name}'")
+                    indeg[i]+=1; children[pos[d]].append(i)
+            ready=[i for i,d in enumerate(indeg) if d==0]; heapq.heapify(ready); order=[]
+            while ready:
+                i=heapq.heappop(ready); order.append(i)
+                for c in children[i]:
+                    indeg[c]-=1
+                    if indeg[c]==0: heapq.heappush(ready,c)
+            if len(order)<len(rules): raise ValueError(f"dependency cycle in group: {group_name}")
+            at={old:new for new,old in enumerate(order)}; ordered=[rules[i] for i in order]
+            plan=ExecutionPlan(group_name, m, sig, tuple(ordered),
+                               tuple(self.get_effective_thresholds([r.layer.level for r in ordered],m).tolist()),
+                               tuple(self.rules.get(r.fallback_rule) if r.fallback_rule else None for r in ordered),
+                               (), tuple(tuple(at[pos[d]] for d in r.dependencies) for r in ordered))
+            self._plans[key]=plan
+        return plan
+
+    def invalidate_plans(self)->None:
+        self._rules_version+=1; self._plans.clear(); self.memo_cache.clear()  # 규칙이 바뀌면 메모된 출력도 무효
+
+    def register_rule(self, rule:Rule)->None:
+        self.rules[rule.key]=rule; self.invalidate_plans()
+
+    def unregister_rule(self, key:str)->None:
+        self.rules.pop(key,None); self.invalidate_plans()
+
+    def update_velocity_config(self, **changes)->None:
+        profiles=self.threshold_table.profiles if self.threshold_table is not None else ("standard",)
+        if changes.get("profile") is not None and changes["profile"] not in profiles:
+            raise ValueError(f"unknown velocity profile: {changes['profile']}")
+        if self._config_shared:
+            self.config=replace(self.config,layer_multipliers=dict(self.config.layer_multipliers)); self._config_shared=False
+        for k,v in changes.items():
+            if not hasattr(self.config,k): raise AttributeError(f"unknown config field: {k}")
+            setattr(self.config,k,v)
+        self._rebuild_thresholds(); self.invalidate_plans()
+
+    def execute_top_down(self, group_name:str, input_data:Any, execution_id:Optional[str]=None,
+                         checkpoint_every:Literal["rule","layer"]="rule", deadline:Optional[float]=None)->Dict[str,Any]:
+        """
+        execution_id를 주면 규칙(또는 레이어)마다 체크포인트를 남기고, 같은 id·같은 입력으로 다시 제출되면 마지막
+        체크포인트부터 이어서 실행한다(결과의 resumed_from에 재개 위치). 입력이 다르면 체크포인트를 버리고 처음부터. 완료 시 삭제.
+        deadline(초, 기본 그룹 metadata["deadline"])은 그룹 전체 지연 예산으로, 넘기면 남은 규칙을 건너뛰고
+        success=False, deadline_exceeded=True를 반환한다(체크포인트는 남겨 재개 가능).
+        """
+        return self._top_down(group_name,input_data,execution_id=execution_id,checkpoint_every=checkpoint_every,deadline=deadline)
+
+    def _top_down(self, group_name:str, input_data:Any, trace:Optional[Dict[str,Tuple]]=None,
+                  execution_id:Optional[str]=None, checkpoint_every:str="rule", deadline:Optional[float]=None)->Dict[str,Any]:
+        """trace가 주어지면 재사용 가능한 규칙의 {키: (입력 payload, (입력 타입, 값 지문), 출력, 속도)}를 기록"""
+        plan=self.compile_plan(group_name); cur=_Carrier(input_data); metrics=[]
+        blocked_any=False; velocities=[]; start=0; keys=tuple(r.key for r in plan.rules)
+        deadline_at=self._deadline_at(group_name,deadline); late:List[str]=[]; digest=None
+        if execution_id is not None:
+            if checkpoint_every not in ("rule","layer"): raise ValueError(f"unsupported checkpoint_every: {checkpoint_every}")
+            digest=_input_digest(input_data); ck=self.checkpoints.load(execution_id)
+            if ck and digest is not None and (ck["group"],ck["mode"],ck["rules"],ck.get("input"))==(group_name,plan.mode.name,list(keys),digest):
+                cur=_Carrier(ck["payload"]); velocities=ck["velocities"]; start=ck["next"]
+                metrics=[ExecutionMetrics(**{**m,"layer":Layer[m["layer"]],"status":ExecutionStatus(m["status"])}) for m in ck["metrics"]]
+            else:
+                if ck: self.checkpoints.delete(execution_id)  # 다른 입력/계획의 체크포인트는 재개하지 않음
+                self.checkpoints.prune()
+        for i,(rule,th,fb) in enumerate(zip(plan.rules,plan.thresholds,plan.fallbacks)):
+            if i<start: continue
+            if deadline_at is not None and perf_counter()>=deadline_at: late=list(keys[i:]); break
+            before=cur.array; t0=perf_counter(); status=ExecutionStatus.RUNNING; err=None; v=0.0; to=self._timeout_for(rule,deadline_at); timed_out=False
+            if rule.metadata.get("inplace"): before=before.copy()
+            mk=self.memo_cache.key(rule,cur) if rule.cache_ttl>0 else None; hit=None
+            tk=mk or (self.memo_cache.key(rule,cur) if trace is not None and _reusable(rule) else None)
             try:
-                out=rule.function(data)
-                after=_to_np(out); v=self.calculate_velocity(rule.layer,before,after)
-                blocked,th=self.check_velocity_threshold(rule.layer,v)
+                hit=self.memo_cache.get(mk) if mk else None
+                if hit: nxt,v=hit
+                else:
+                    nxt=self._invoke(rule,cur,to)
+                    v=self.calculate_velocity(rule.layer,before,nxt.array)
+                    if mk: self.memo_cache.put(mk,rule.cache_ttl,nxt,v)
+                if tk and trace is not None and _reusable(rule): trace[rule.key]=(cur.payload,tk[1:],nxt,v)
+                blocked=v>=th
                 velocities.append(v)
                 status=ExecutionStatus.BLOCKED if blocked else ExecutionStatus.SUCCESS
                 if blocked and rule.is_critical: blocked_any=True
-                data = data if (blocked and rule.is_critical) else out
+                cur = cur if (blocked and rule.is_critical) else nxt
             except Exception as e:
-                status=ExecutionStatus.FAILED; err=str(e)
-                if rule.fallback_rule and rule.fallback_rule in self.rules:
-                    try: data=self.rules[rule.fallback_rule].function(data); status=ExecutionStatus.SUCCESS
-                    except Exception as e2: err=f"{err}; fallback:{e2}"
+                timed_out=isinstance(e,TimeoutError); err=str(e) or type(e).__name__
+                status=ExecutionStatus.TIMEOUT if timed_out else ExecutionStatus.FAILED
+                if timed_out: cur=_detached(cur)
+                if fb is not None:
+                    try: cur=self._invoke(fb,cur,self._timeout_for(fb,deadline_at)); status=ExecutionStatus.SUCCESS
+                    except Exception as e2: err=f"{err}; fallback:{e2 or type(e2).__name__}"
             t1=perf_counter()
-            met=ExecutionMetrics(rule.key, rule.layer, t0, t1, (t1-t0)*1000.0, locals().get('v',0.0),
-                                 locals().get('th',self.get_effective_threshold(rule.layer)),
-                                 status, _sh(before.tolist() if hasattr(before,"tolist") else before),
-                                 _sh(_to_np(data).tolist() if hasattr(np,"array") else data), err)
-            metrics.append(met); executed.add(rule.key)
-            self._note("rule", "INFO" if status==ExecutionStatus.SUCCESS else "WARNING", status.value, rule_key=rule.key, layer=rule.layer, v=locals().get('v',0.0))
+            met=ExecutionMetrics(rule.key, rule.layer, t0, t1, (t1-t0)*1000.0, v, th,
+                                 status, self._fp(before), self._fp(cur.array), err, cached=hit is not None,
+                                 timed_out=timed_out)
+            metrics.append(met); self.profiler.observe_metric(met)
+            self._note("rule", "INFO" if status==ExecutionStatus.SUCCESS else "WARNING", status.value, rule_key=rule.key, layer=rule.layer, v=v)
             if blocked_any: break
+            if digest is not None and i+1<len(keys) and (checkpoint_every=="rule" or plan.rules[i+1].layer is not rule.layer):
+                self.checkpoints.save(execution_id,{"group":group_name,"mode":plan.mode.name,"rules":list(keys),"next":i+1,"input":digest,
+                                                    "payload":cur.payload,"velocities":velocities,
+                                                    "metrics":[{**m.__dict__,"layer":m.layer.name,"status":m.status.value} for m in metrics]})
+        if execution_id is not None and not late: self.checkpoints.delete(execution_id)
         agg=self.calculate_cumulative_velocity(velocities) if velocities else 0.0
-        return {"success": not blocked_any, "output": data, "metrics":[m.__dict__ for m in metrics], "cumulative_velocity":agg}
+        out={"success": not blocked_any and not late, "output": cur.payload, "metrics":[m.__dict__ for m in metrics], "cumulative_velocity":agg}
+        if start: out["resumed_from"]=start
+        if late: out["deadline_exceeded"]=True; out["skipped_rules"]=late
+        return out
+
+    def compile_layer_order(self, start_layer:Layer=Layer.L1_QUANTUM, mode:Optional[DualityMode]=None)->ExecutionPlan:
+        """상향 실행용 레이어 순 인덱스(전체 규칙, 레이어 오름차순·등록 순). start_layer 미만 규칙은 skipped"""
+        m=mode or self.current_mode; sig=self._check_plan_signature()
+        key=("_bottom_up",m,start_layer)
+        plan=self._plans.get(key)
+        if plan is None:
+            ranked=sorted(self.rules.values(), key=lambda r:r.layer.level)
+            order=tuple(r for r in ranked if r.layer.level>=start_layer.level)
+            plan=ExecutionPlan("_bottom_up", m, sig, order, tuple(self.get_effective_thresholds([r.layer.level for r in order],m).tolist()),
+                               (None,)*len(order), tuple(r.key for r in ranked if r.layer.level<start_layer.level))
+            self._plans[key]=plan
+        return plan
 
     def execute_bottom_up(self, signal_data:Any, start_layer:Layer=Layer.L1_QUANTUM)->Dict[str,Any]:
-        # 단순: 낮은 레이어 우선
-        order=sorted(self.rules.values(), key=lambda r:r.layer.level)
-        data=signal_data; metrics=[]; velocities=[]
-        for rule in order:
-            before=_to_np(data); t0=perf_counter(); err=None
+        return self._bottom_up(signal_data,start_layer)
+
+    def _bottom_up(self, signal_data:Any, start_layer:Layer, reuse:Optional[Dict[str,Tuple]]=None)->Dict[str,Any]:
+        """reuse: _top_down의 trace. 같은 입력을 받은 규칙은 다시 실행하지 않고 출력/속도를 재사용(cached=True)"""
+        plan=self.compile_layer_order(start_layer)
+        cur=_Carrier(signal_data); metrics=[]; velocities=[]; reused=0; digest=None
+        for rule,th in zip(plan.rules,plan.thresholds):
+            before=cur.array; t0=perf_counter(); err=None; v=0.0; hit=None
+            if rule.metadata.get("inplace"): before=before.copy()
             try:
-                out=rule.function(data); after=_to_np(out)
-                v=self.calculate_velocity(rule.layer,before,after); blocked,th=self.check_velocity_threshold(rule.layer,v)
+                prev=reuse.get(rule.key) if reuse else None
+                if prev is not None:
+                    if prev[0] is not cur.payload and digest is None:
+                        k=self.memo_cache.key(rule,cur); digest=k[1:] if k else ()  # (입력 타입, 값 지문)
+                    if prev[0] is cur.payload or prev[1]==digest: hit=prev
+                if hit: nxt,v=hit[2],hit[3]; reused+=1
+                else:
+                    nxt=self._invoke(rule,cur,self._timeout_for(rule,None)); v=self.calculate_velocity(rule.layer,before,nxt.array)
+                blocked=v>=th
                 velocities.append(v); status=ExecutionStatus.BLOCKED if blocked else ExecutionStatus.SUCCESS
-                data = data if blocked else out
+                if not blocked and nxt is not cur: cur=nxt; digest=None
             except Exception as e:
-                status=ExecutionStatus.FAILED; err=str(e)
+                status=ExecutionStatus.TIMEOUT if isinstance(e,TimeoutError) else ExecutionStatus.FAILED; err=str(e) or type(e).__name__
+                if status is ExecutionStatus.TIMEOUT: cur=_detached(cur); digest=None
             t1=perf_counter()
-            metrics.append(ExecutionMetrics(rule.key, rule.layer, t0,t1,(t1-t0)*1000.0, locals().get('v',0.0),
-                                            locals().get('th',self.get_effective_threshold(rule.layer)), status, _sh(before), _sh(_to_np(data)), err).__dict__)
-        return {"success":True, "output":data, "metrics":metrics, "cumulative_velocity":self.calculate_cumulative_velocity(velocities) if velocities else 0.0}
+            met=ExecutionMetrics(rule.key, rule.layer, t0,t1,(t1-t0)*1000.0, v, th, status, self._fp(before), self._fp(cur.array), err,
+                                 cached=hit is not None, timed_out=status is ExecutionStatus.TIMEOUT)
+            metrics.append(met.__dict__); self.profiler.observe_metric(met)
+        return {"success":True, "output":cur.payload, "metrics":metrics, "cumulative_velocity":self.calculate_cumulative_velocity(velocities) if velocities else 0.0,
+                "reused":reused}
 
-    def execute_bidirectional(self, group_name:str, input_data:Any)->Dict[str,Any]:
-        top=self.execute_top_down(group_name,input_data)
-        bot=self.execute_bottom_up(top["output"])
+    def execute_bidirectional(self, group_name:str, input_data:Any, reuse:bool=True, start_layer:Layer=Layer.L1_QUANTUM)->Dict[str,Any]:
+        """
+        하향 후 상향. reuse=True면 하향에서 같은 입력으로 실행된 규칙의 출력/속도를 상향에서 재사용한다
+        (inplace 규칙과 metadata["pure"]=False 규칙은 항상 다시 실행). start_layer 미만 규칙은 상향에서 제외.
+        """
+        trace:Optional[Dict[str,Tuple]]={} if reuse else None
+        top=self._top_down(group_name,input_data,trace)
+        bot=self._bottom_up(top["output"],start_layer,trace)
         merged={"success": top["success"] and bot["success"], "output": bot["output"],
                 "top_down": top, "bottom_up": bot}
         return merged
 
+    def execute_dag(self, group_name:str, input_data:Any, executor:Literal["thread","process"]="thread", max_workers:Optional[int]=None)->Dict[str,Any]:
+        """
+        의존성 DAG를 풀에서 병렬 실행. 루트는 input_data를, 선행 규칙이 하나면 그 출력을,
+        여럿이면 {선행키: 출력} dict를 입력으로 받는다(이때 속도 기준선은 선행 출력 배열을 이어 붙인 것).
+        속도/차단 판정은 호출 스레드에서 하며, critical 차단 시 그 규칙에 의존하는 모든 하위 규칙을 취소한다.
+        워커가 죽은 풀은 버리고 새 풀로 이어 가며, 제출조차 실패한 규칙은 FAILED로 기록한다.
+        """
+        plan=self.compile_dag(group_name); n=len(plan.rules)
+        children:List[List[int]]=[[] for _ in range(n)]
+        for i,ps in enumerate(plan.parents):
+            for p in ps: children[p].append(i)
+        waiting=[len(ps) for ps in plan.parents]; inputs:List[Any]=[None]*n; outputs:List[Any]=[None]*n
+        metrics:List[Optional[ExecutionMetrics]]=[None]*n; vel:List[Optional[float]]=[None]*n
+        cancelled=set(); blocked_any=False; running:Dict[Any,Tuple[int,float]]={}
+        key=_pool_key(executor,max_workers); pool=self._get_pool(executor,max_workers); root=_Carrier(input_data)
+        def submit(i:int)->None:
+            nonlocal pool
+            ps=plan.parents[i]
+            data=root if not ps else outputs[ps[0]] if len(ps)==1 else \
+                _Carrier({plan.rules[p].key:outputs[p].payload for p in ps}, np.concatenate([outputs[p].array.ravel() for p in ps]))
+            inputs[i]=data; fb=plan.fallbacks[i]; args=(_call_rule, plan.rules[i].function, fb.function if fb else None, data.payload)
+            try: fut=pool.submit(*args)
+            except (BrokenExecutor,RuntimeError):
+                if self._pools.get(key) is pool: self._pools.pop(key,None)
+                pool=self._get_pool(executor,max_workers)
+                try: fut=pool.submit(*args)
+                except Exception as e: fut=Future(); fut.set_exception(e)
+            running[fut]=(i,perf_counter())
+        for i in range(n):
+            if waiting[i]==0: submit(i)
+        while running:
+            done,_=wait(list(running),return_when=FIRST_COMPLETED)
+            for fut in sorted(done,key=lambda f:running[f][0]):
+                i,t0=running.pop(fut); rule=plan.rules[i]; th=plan.thresholds[i]; data=inputs[i]; v=0.0
+                try: out,err,state=fut.result()
+                except Exception as e:
+                    out,err,state=None,str(e),"failed"
+                    if isinstance(e,BrokenExecutor) and self._pools.get(key) is pool: self._pools.pop(key,None)
+                stop=False
+                if state=="ok":
+                    out=_Carrier(out); v=self.calculate_velocity(rule.layer,data.array,out.array); vel[i]=v
+                    status=ExecutionStatus.BLOCKED if v>=th else ExecutionStatus.SUCCESS
+                    stop=status is ExecutionStatus.BLOCKED and rule.is_critical
+                    outputs[i]=data if stop else out
+                elif state=="fallback": status=ExecutionStatus.SUCCESS; outputs[i]=_Carrier(out)
+                else: status=ExecutionStatus.FAILED; outputs[i]=data
+                t1=perf_counter()
+                metrics[i]=ExecutionMetrics(rule.key, rule.layer, t0, t1, (t1-t0)*1000.0, v, th, status,
+                                            self._fp(data.array), self._fp(outputs[i].array), err)
+                self.profiler.observe_metric(metrics[i])
+                self._note("rule", "INFO" if status==ExecutionStatus.SUCCESS else "WARNING", status.value, rule_key=rule.key, layer=rule.layer, v=v)
+                if stop:
+                    blocked_any=True; stack=list(children[i])
+                    while stack:
+                        c=stack.pop()
+                        if c not in cancelled: cancelled.add(c); stack.extend(children[c])
+                    continue
+                for c in children[i]:
+                    waiting[c]-=1
+                    if waiting[c]==0 and c not in cancelled: submit(c)
+        sinks=[i for i in range(n) if not children[i] and metrics[i] is not None]
+        out=outputs[sinks[0]].payload if len(sinks)==1 else {plan.rules[i].key:outputs[i].payload for i in sinks}
+        vs=[x for x in vel if x is not None]
+        return {"success": not blocked_any, "output": out,
+                "outputs": {plan.rules[i].key:outputs[i].payload for i in range(n) if metrics[i] is not None},
+                "metrics": [m.__dict__ for m in metrics if m is not None],
+                "cancelled": [plan.rules[i].key for i in sorted(cancelled)],
+                "cumulative_velocity": self.calculate_cumulative_velocity(vs) if vs else 0.0}
+
+    def shutdown_pools(self, wait_for:bool=True)->None:
+        for pool in self._pools.values(): pool.shutdown(wait=wait_for)
+        self._pools.clear()
+
+    def set_fingerprint(self, strategy:Union[str,Callable[[Any],str]])->None:
+        """input_hash/output_hash 전략: "sha256"(기존), "blake2b", "sampled", "none" 또는 callable"""
+        if callable(strategy): self._fp=strategy; self.fingerprint_name=getattr(strategy,"__name__","custom")
+        elif strategy in _FINGERPRINTS: self._fp=_FINGERPRINTS[strategy]; self.fingerprint_name=strategy
+        else: raise ValueError(f"unsupported fingerprint: {strategy}")
+
     # ---- 7. 통합 ----
-    def execute_with_full_integration(self, group_name:str, input_data:Any, enable_prediction:bool=True, enable_monitoring:bool=True)->Dict[str,Any]:
-        codon=None
-        try:
-            codon=self.analyze_codon(json.dumps(input_data))  # 간단 표본화
-        except Exception: pass
-        if enable_prediction:
-            blk, pr=self.predict_and_block(_to_np(input_data), group_name, auto_block=True)
-            if blk:
-                out={"success":False,"blocked_by_predictor":True,"prediction":pr.__dict__,"codon_analysis":codon.__dict__ if codon else None}
-                self.execution_history.append(out); return out
+    def execute_with_full_integration(self, group_name:str, input_data:Any, enable_prediction:bool=True, enable_monitoring:bool=True,
+                                      codon:Optional[Literal["eager","lazy","off"]]=None)->Dict[str,Any]:
+        """codon: 입력 코돈 분석 시점 — "eager"(즉시), "lazy"(결과의 codon_analysis를 읽을 때), "off". 기본값은 엔진의 codon_mode"""
+        rec=self.recorder; t0=perf_counter()
+        res=self._full_integration(group_name,input_data,enable_prediction,enable_monitoring,codon)
+        if rec is not None:
+            rec.write(self,group_name,input_data,{"enable_prediction":enable_prediction,"enable_monitoring":enable_monitoring,"codon":codon},res,(perf_counter()-t0)*1000.0)
+        return res
+
+    def _full_integration(self, group_name:str, input_data:Any, enable_prediction:bool, enable_monitoring:bool, codon:Optional[str])->Dict[str,Any]:
+        codon_mode=codon; codon,blocked=self._integration_prelude(group_name,input_data,enable_prediction,codon_mode)
+        if blocked is not None: return blocked
         if self.current_direction==FlowDirection.BOTTOM_UP:
             res=self.execute_bottom_up(input_data)
         elif self.current_direction==FlowDirection.BIDIRECTIONAL:
             res=self.execute_bidirectional(group_name,input_data)
         else:
             res=self.execute_top_down(group_name,input_data)
+        return self._integration_finish(group_name,res,codon,enable_monitoring,codon_mode)
+
+    def _integration_prelude(self, group_name:str, input_data:Any, enable_prediction:bool, codon_mode:Optional[str]=None)->Tuple[Callable[[],Optional[Dict[str,Any]]],Optional[Dict[str,Any]]]:
+        """-> (codon_analysis dict를 돌려주는 loader, 예측 차단 시 결과). eager면 loader는 이미 계산된 값을 돌려줌"""
+        mode=codon_mode or self.codon_mode
+        def load()->Optional[Dict[str,Any]]:
+            try: return dict(self.analyze_codon(json.dumps(input_data), use_cache=True).__dict__)  # 간단 표본화
+            except Exception: return None
+        if mode=="eager": done=load(); codon=lambda: done
+        elif mode=="lazy": codon=load
+        elif mode=="off": codon=lambda: None
+        else: raise ValueError(f"unsupported codon mode: {mode}")
+        if enable_prediction:
+            blk, pr=self.predict_and_block(_to_np(input_data), group_name, auto_block=True)
+            if blk:
+                out=self._with_codon({"success":False,"blocked_by_predictor":True,"prediction":dict(pr.__dict__)},codon,mode,always=True)
+                self.execution_history.append(out); return codon, out
+        return codon, None
+
+    def _integration_finish(self, group_name:str, res:Dict[str,Any], codon:Callable[[],Optional[Dict[str,Any]]], enable_monitoring:bool, codon_mode:Optional[str]=None)->Dict[str,Any]:
         if enable_monitoring:
             self._note("exec","INFO","completed", rule_key=group_name, layer=Layer.L7_COSMOS, success=res.get("success"))
-        if codon: res["codon_analysis"]=codon.__dict__
+        res=self._with_codon(res,codon,codon_mode or self.codon_mode)
         self.execution_history.append(res); return res
 
+    @staticmethod
+    def _with_codon(res:Dict[str,Any], codon:Callable[[],Optional[Dict[str,Any]]], mode:str, always:bool=False)->Dict[str,Any]:
+        if mode=="lazy": return IntegrationResult(res,codon)
+        c=codon()
+        if c or always: res["codon_analysis"]=c
+        return res
+
     # ---- 8. 상태/관리 ----
     def get_comprehensive_status(self)->Dict[str,Any]:
         return {
             "mode": self.current_mode.name,
             "direction": self.current_direction.name,
             "history_count": len(self.execution_history),
+            "history": self.execution_history.stats(),
+            "fingerprint": self.fingerprint_name,
+            "memo_cache": self.memo_cache.stats(),
+            "watchdog": self.watchdog_stats(),
+            "prediction_cache": self.prediction_cache.stats(),
+            "codon_cache": self.codon_cache.stats(),
+            "rule_profile": self.profiler.top(5),
             "monitoring": self.get_monitoring_statistics(),
         }
 
+    def estimated_bytes(self)->int:
+        """엔진 상태의 대략적인 메모리 사용량(이력 컬럼 + 메모 캐시 + 이벤트/모니터 버퍼)"""
+        h=self.execution_history
+        cols=sum(a.nbytes for a in vars(h).values() if isinstance(a,np.ndarray))
+        buf=getattr(self.execution_monitor,"buf",())
+        return int(cols+self.memo_cache.bytes+512*(len(self._events)+len(buf)+len(h._payloads)))
+
+    def start_recording(self, path:str, append:bool=True)->ExecutionRecorder:
+        """이후 execute_with_full_integration 호출을 path에 기록 (실행 중 켜고 끌 수 있음)"""
+        self.stop_recording(); self.recorder=ExecutionRecorder(path,append); return self.recorder
+
+    def stop_recording(self)->int:
+        rec,self.recorder=self.recorder,None
+        if rec is None: return 0
+        rec.close(); return rec.count
+
+    def replay_capture(self, path:str, atol:float=1e-9, max_diffs:int=100)->Dict[str,Any]:
+        """
+        기록된 호출을 기록 당시의 모드/방향으로 최대 속도로 다시 실행하고 처리량과 출력/속도 차이를 보고.
+        재생은 같은 규칙/설정/계산기를 쓰는 별도 엔진(_shadow)에서 돌려 이 엔진의 모드/이력/프로파일/캐시/이벤트를 건드리지 않는다.
+        """
+        shadow=self._shadow()
+        n=mismatches=0; diffs:List[Dict[str,Any]]=[]; busy=0.0; recorded_ms=0.0
+        try:
+            for r in read_capture(path):
+                shadow.current_mode=DualityMode[r["mode"]]; shadow.current_direction=FlowDirection[r["direction"]]
+                opts=r["options"]; t0=perf_counter()
+                res=shadow._full_integration(r["group"],r["input_value"],opts.get("enable_prediction",True),False,opts.get("codon"))
+                busy+=perf_counter()-t0; recorded_ms+=r["duration_ms"]
+                d=self._capture_diff(r,res,atol)
+                if d:
+                    mismatches+=1
+                    if len(diffs)<max_diffs: diffs.append({"index":n,"group":r["group"],**d})
+                n+=1
+        finally:
+            shadow.shutdown_pools(wait_for=False)
+        return {"records":n,"seconds":busy,"throughput_per_s":n/busy if busy>0 else 0.0,
+                "recorded_ms":recorded_ms,"replayed_ms":busy*1000.0,"mismatches":mismatches,"diffs":diffs}
+
+    def _shadow(self)->"CosmosPROEngine":
+        """
+        같은 규칙/그룹/설정/계산기/임계값 원본(velocity_policy, 현재 프로파일 포함)과 캐시 설정을 쓰되
+        이력·프로파일·캐시 내용·이벤트·모니터는 따로 갖는 엔진 (재생용)
+        """
+        pc,mc=self.prediction_cache,self.memo_cache
+        return CosmosPROEngine(list(self.rules.values()),self.groups,self.config,self.velocity_calculator,self.codon_analyzer,
+                               self.cascade_predictor,_LocalMonitor(),self._fp,history_limit=1,event_limit=1,
+                               memo_max_entries=mc.max_entries,memo_max_bytes=mc.max_bytes,
+                               analysis_cache_size=pc.max_entries,analysis_cache_ttl=pc.ttl,
+                               prediction_cache_decimals=self.prediction_cache_decimals,
+                               codon_mode=self.codon_mode,share_config=True,rule_timeout=self.rule_timeout,
+                               velocity_policy=self.velocity_policy)
+
+    @staticmethod
+    def _capture_diff(r:Dict[str,Any], res:Dict[str,Any], atol:float)->Dict[str,Any]:
+        d:Dict[str,Any]={}
+        if bool(res.get("success"))!=r["success"]: d["success"]=[r["success"],bool(res.get("success"))]
+        want,got=r["output_value"],res.get("output")
+        try: same=bool(np.allclose(np.asarray(want,dtype=float),np.asarray(got,dtype=float),atol=atol,rtol=0.0))
+        except Exception: same=json.dumps(want,default=str)==json.dumps(got,default=str)
+        if not same: d["output"]=True
+        cv=float(res.get("cumulative_velocity") or 0.0)
+        if abs(cv-r["cumulative_velocity"])>atol: d["cumulative_velocity"]=[r["cumulative_velocity"],cv]
+        vs=[[m.get("rule_key",""),float(m.get("velocity") or 0.0)] for m in ExecutionHistory._metrics_of(res)]
+        if len(vs)!=len(r["velocities"]) or any(a[0]!=b[0] or abs(a[1]-b[1])>atol for a,b in zip(r["velocities"],vs)):
+            d["velocities"]=[r["velocities"],vs]
+        return d
+
     def reset_statistics(self)->None:
-        self.execution_history.clear(); self.flush_monitoring_buffer(); self._events.clear()
+        self.execution_history.clear(); self.flush_monitoring_buffer(); self._events.clear(); self.profiler.clear()
+
+    def get_rule_profile(self, top_n:Optional[int]=10)->List[Dict[str,Any]]:
+        """누적 소요 시간 상위 top_n 규칙의 지연 분포(p50/p90/p99/max), 호출 수, 차단/실패율"""
+        return self.profiler.top(top_n)
 
     def export_execution_report(self, filepath:str, format:Literal["json","yaml","csv"]="json")->None:
-        data=self.execution_history
+        data=list(self.execution_history)
         os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
         if format=="json":
-            with open(filepath,"w",encoding="utf-8") as f: json.dump(data,f,ensure_ascii=False,indent=2)
+            with open(filepath,"w",encoding="utf-8") as f: json.dump(data,f,ensure_ascii=False,indent=2,default=str)
         elif format=="yaml":
             try:
                 import yaml
                 with open(filepath,"w",encoding="utf-8") as f: yaml.safe_dump(data,f,sort_keys=False,allow_unicode=True)
             except Exception: 
-                with open(filepath,"w",encoding="utf-8") as f: json.dump({"warning":"yaml_unavailable","data":data},f,ensure_ascii=False,indent=2)
+                with open(filepath,"w",encoding="utf-8") as f: json.dump({"warning":"yaml_unavailable","data":data},f,ensure_ascii=False,indent=2,default=str)
         elif format=="csv":
             import csv
             with open(filepath,"w",newline="",encoding="utf-8") as f:
@@ -405,6 +1207,238 @@ class CosmosPROEngine:
         else:
             raise ValueError("unsupported format")
 
+    _STREAM_COLUMNS=("seq","timestamp","success","cumulative_velocity","blocked_by_predictor",
+                     "rule_key","layer","status","velocity","threshold","duration_ms","cached","error")
+
+    def export_execution_stream(self, filepath:str, format:Literal["ndjson","csv"]="ndjson", compress:Optional[bool]=None,
+                                start:Optional[int]=None, stop:Optional[int]=None, since:Optional[float]=None, until:Optional[float]=None,
+                                append:bool=False)->Dict[str,Any]:
+        """
+        실행 이력을 한 건씩 기록하는 스트리밍 내보내기. ndjson은 실행당 한 줄(규칙 지표는 스칼라로 평탄화),
+        csv는 규칙 지표당 한 행. compress=None이면 확장자 .gz로 gzip 여부를 정한다.
+        append=True면 기존 파일 뒤에 이어 쓰며(gzip은 멤버 추가) 반환값의 next_index를 다음 호출의 start로 넘기면
+        이미 내보낸 실행을 다시 직렬화하지 않고 주기적으로 이어 쓸 수 있다.
+        """
+        if format not in ("ndjson","csv"): raise ValueError("unsupported format")
+        gz=filepath.endswith(".gz") if compress is None else compress
+        os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+        fresh=not (append and os.path.exists(filepath) and os.path.getsize(filepath)>0)
+        mode=("a" if append else "w")+"t"
+        f=gzip.open(filepath,mode,encoding="utf-8",newline="") if gz else open(filepath,mode,encoding="utf-8",newline="")
+        first=self.execution_history.total-len(self.execution_history); records=rows=0; nxt=first if start is None else max(first,start)
+        with f:
+            if format=="csv":
+                import csv
+                w=csv.writer(f)
+                if fresh: w.writerow(self._STREAM_COLUMNS)
+            for seq,ts,res in self.execution_history.iter_range(start,stop,since,until):
+                head={"seq":seq,"timestamp":ts,"success":bool(res.get("success")),
+                      "cumulative_velocity":float(res.get("cumulative_velocity") or 0.0),
+                      "blocked_by_predictor":bool(res.get("blocked_by_predictor"))}
+                mets=[_flat_metric(m) for m in ExecutionHistory._metrics_of(res)]
+                if format=="ndjson":
+                    f.write(json.dumps({**head,"metrics":mets},ensure_ascii=False,default=str)); f.write("\n"); rows+=1
+                else:
+                    for m in mets or [{}]:
+                        row={**head,**m}; w.writerow([row.get(c,"") for c in self._STREAM_COLUMNS]); rows+=1
+                records+=1; nxt=seq+1
+        return {"path":filepath,"records":records,"rows":rows,"next_index":nxt}
+
+    # ---- 9. 배치 ----
+    def execute_batch(self, group_name:str, inputs:Any)->Dict[str,Any]:
+        """
+        2-D 배열(또는 동일 모양 입력 목록)의 각 행을 execute_top_down과 같은 규칙으로 처리.
+        metadata["vectorized"]=True 규칙은 행렬 전체에 한 번만 호출되고, 나머지는 행 단위로 호출된다.
+        속도/차단 판정은 NumPy로 행 단위 일괄 계산하며 결과는 컬럼형으로 반환한다.
+        """
+        plan=self.compile_plan(group_name)
+        cur=list(inputs) if isinstance(inputs,(list,tuple)) else None
+        X=np.asarray(inputs,dtype=float)
+        if X.ndim==1: X=X.reshape(-1,1)
+        if X.ndim!=2: raise ValueError(f"batch inputs must be 2-D, got shape {X.shape}")
+        n=X.shape[0]; idx=np.arange(n); final:List[Any]=[None]*n
+        stopped=np.zeros(n,dtype=bool)
+        keys=[]; layers=[]; ths=[]; durs=[]; vcols=[]; scols=[]
+        for rule,th,fb in zip(plan.rules,plan.thresholds,plan.fallbacks):
+            t0=perf_counter()
+            v=np.full(n,np.nan); st=np.full(n,_STATUS_CODE[ExecutionStatus.PENDING],dtype=np.int8)
+            if len(idx):
+                outs,Y,ok,fail=self._batch_apply(rule,fb,X,cur)
+                vi=np.full(len(idx),np.nan)
+                if ok.any():
+                    if Y is not None and X is not None:
+                        vi[ok]=self.calculate_velocity_batch(rule.layer,X[ok],Y[ok])
+                    else:
+                        for j in np.flatnonzero(ok):
+                            vi[j]=self.calculate_velocity(rule.layer,_to_np(cur[j] if cur is not None else X[j]),_to_np(outs[j]))
+                blk=ok & (vi>=th)
+                sti=np.where(blk,_STATUS_CODE[ExecutionStatus.BLOCKED],_STATUS_CODE[ExecutionStatus.SUCCESS]).astype(np.int8)
+                sti[fail]=_STATUS_CODE[ExecutionStatus.FAILED]
+                v[idx]=vi; st[idx]=sti
+                stop=blk if rule.is_critical else np.zeros(len(idx),dtype=bool)
+                for j in np.flatnonzero(stop):
+                    final[idx[j]]=cur[j] if cur is not None else X[j]; stopped[idx[j]]=True
+                keep=np.flatnonzero(~stop)
+                if outs is None: X=Y[keep]; cur=None
+                else:
+                    prev=cur
+                    cur=[outs[j] if (ok[j] or outs[j] is not None) else (prev[j] if prev is not None else X[j]) for j in keep]
+                    X=_stack_rows(cur)
+                idx=idx[keep]
+            t1=perf_counter()
+            keys.append(rule.key); layers.append(rule.layer.level); ths.append(th); durs.append((t1-t0)*1000.0)
+            vcols.append(v); scols.append(st)
+            ran=int((st!=_STATUS_CODE[ExecutionStatus.PENDING]).sum())
+            if ran: self.profiler.observe(rule.key, durs[-1], ran, int((st==_STATUS_CODE[ExecutionStatus.BLOCKED]).sum()),
+                                          int((st==_STATUS_CODE[ExecutionStatus.FAILED]).sum()))
+        for j,i in enumerate(idx): final[i]=cur[j] if cur is not None else X[j]
+        V=np.stack(vcols,axis=1) if vcols else np.zeros((n,0))
+        S=np.stack(scols,axis=1) if scols else np.zeros((n,0),dtype=np.int8)
+        out=X if (cur is None and X is not None and not stopped.any()) else _stack_rows(final)
+        self._note("batch","INFO",f"rows={n} rules={len(keys)} stopped={int(stopped.sum())}", rule_key=group_name, layer=Layer.L7_COSMOS)
+        return {"success": ~stopped, "output": out if out is not None else final,
+                "rules": keys, "layers": np.array(layers,dtype=np.int8), "thresholds": np.array(ths),
+                "duration_ms": np.array(durs), "velocity": V, "status": S,
+                "status_names": [s.value for s in ExecutionStatus],
+                "cumulative_velocity": self.calculate_cumulative_velocity_batch(V)}
+
+    def calculate_velocity_batch(self, layer:Layer, before:np.ndarray, after:np.ndarray)->np.ndarray:
+        if self.velocity_calculator or _ext_velocity:
+            return np.array([self.calculate_velocity(layer,b,a) for b,a in zip(before,after)],dtype=float)
+        return _simple_velocity_rows(before,after)
+
+    def calculate_cumulative_velocity_batch(self, V:np.ndarray)->np.ndarray:
+        """(N,R) 속도 행렬(미실행=NaN)의 행별 누적 속도"""
+        if self.velocity_calculator or _ext_cumulative:
+            return np.array([self.calculate_cumulative_velocity([float(x) for x in row if not np.isnan(x)]) if (~np.isnan(row)).any() else 0.0 for row in V],dtype=float)
+        p=np.prod(np.where(np.isnan(V),1.0,1.0-np.clip(V,0.0,1.0)),axis=1)
+        return np.clip(1.0-p,0.0,1.0)
+
+    def _batch_apply(self, rule:Rule, fb:Optional[Rule], X:Optional[np.ndarray], cur:Optional[List[Any]]):
+        """규칙을 활성 행에 적용 -> (행별 출력|None, 출력 행렬|None, 성공 마스크, 실패 마스크)"""
+        m=len(cur) if cur is not None else len(X)
+        if rule.metadata.get("vectorized") and X is not None:
+            try:
+                Y=_to_np(rule.function(X))
+                if Y.ndim==1: Y=Y.reshape(-1,1)
+                if Y.ndim==2 and Y.shape[0]==m:
+                    return None, Y, np.ones(m,dtype=bool), np.zeros(m,dtype=bool)
+            except Exception: pass
+        outs:List[Any]=[None]*m; ok=np.zeros(m,dtype=bool); fail=np.zeros(m,dtype=bool)
+        for j in range(m):
+            row=cur[j] if cur is not None else X[j]
+            try: outs[j]=rule.function(row); ok[j]=True
+            except Exception:
+                fail[j]=True
+                if fb is not None:
+                    try: outs[j]=fb.function(row); fail[j]=False
+                    except Exception: pass
+        Y=_stack_rows([outs[j] for j in np.flatnonzero(ok)]) if ok.all() else None
+        return outs, Y, ok, fail
+
+    # ---- 10. 비동기 ----
+    async def execute_top_down_async(self, group_name:str, input_data:Any, rule_timeout:Optional[float]=None, deadline:Optional[float]=None)->Dict[str,Any]:
+        """
+        execute_top_down의 asyncio 버전. 코루틴 규칙은 await, 동기 규칙은 스레드 풀로 넘긴다.
+        규칙별 제한 시간은 metadata["timeout"] 또는 rule_timeout(초)이며, 초과 시 TIMEOUT+폴백. deadline은 동기 버전과 같음.
+        """
+        plan=self.compile_plan(group_name); cur=_Carrier(input_data); metrics=[]
+        blocked_any=False; velocities=[]; deadline_at=self._deadline_at(group_name,deadline); late:List[str]=[]
+        for i,(rule,th,fb) in enumerate(zip(plan.rules,plan.thresholds,plan.fallbacks)):
+            if deadline_at is not None and perf_counter()>=deadline_at: late=[r.key for r in plan.rules[i:]]; break
+            before=cur.array; t0=perf_counter(); status=ExecutionStatus.RUNNING; err=None; v=0.0; timed_out=False
+            if rule.metadata.get("inplace"): before=before.copy()
+            mk=self.memo_cache.key(rule,cur) if rule.cache_ttl>0 else None; hit=None
+            try:
+                hit=self.memo_cache.get(mk) if mk else None
+                if hit: nxt,v=hit
+                else:
+                    nxt=_Carrier(await self._call_rule_async(rule,cur,self._timeout_for(rule,deadline_at,rule_timeout)))
+                    v=self.calculate_velocity(rule.layer,before,nxt.array)
+                    if mk: self.memo_cache.put(mk,rule.cache_ttl,nxt,v)
+                blocked=v>=th
+                velocities.append(v)
+                status=ExecutionStatus.BLOCKED if blocked else ExecutionStatus.SUCCESS
+                if blocked and rule.is_critical: blocked_any=True
+                cur = cur if (blocked and rule.is_critical) else nxt
+            except Exception as e:
+                timed_out=isinstance(e,TimeoutError); err=str(e) or type(e).__name__
+                status=ExecutionStatus.TIMEOUT if timed_out else ExecutionStatus.FAILED
+                if timed_out: cur=_detached(cur)
+                if fb is not None:
+                    try: cur=_Carrier(await self._call_rule_async(fb,cur,self._timeout_for(fb,deadline_at,rule_timeout))); status=ExecutionStatus.SUCCESS
+                    except Exception as e2: err=f"{err}; fallback:{e2 or type(e2).__name__}"
+            t1=perf_counter()
+            met=ExecutionMetrics(rule.key, rule.layer, t0, t1, (t1-t0)*1000.0, v, th,
+                                 status, self._fp(before), self._fp(cur.array), err, cached=hit is not None, timed_out=timed_out)
+            metrics.append(met); self.profiler.observe_metric(met)
+            self._note("rule", "INFO" if status==ExecutionStatus.SUCCESS else "WARNING", status.value, rule_key=rule.key, layer=rule.layer, v=v)
+            if blocked_any: break
+        agg=self.calculate_cumulative_velocity(velocities) if velocities else 0.0
+        out={"success": not blocked_any and not late, "output": cur.payload, "metrics":[m.__dict__ for m in metrics], "cumulative_velocity":agg}
+        if late: out["deadline_exceeded"]=True; out["skipped_rules"]=late
+        return out
+
+    async def execute_with_full_integration_async(self, group_name:str, input_data:Any, enable_prediction:bool=True, enable_monitoring:bool=True, rule_timeout:Optional[float]=None,
+                                                  codon:Optional[Literal["eager","lazy","off"]]=None)->Dict[str,Any]:
+        rec=self.recorder; t0=perf_counter()
+        res=await self._full_integration_async(group_name,input_data,enable_prediction,enable_monitoring,rule_timeout,codon)
+        if rec is not None:
+            rec.write(self,group_name,input_data,{"enable_prediction":enable_prediction,"enable_monitoring":enable_monitoring,"codon":codon},res,(perf_counter()-t0)*1000.0)
+        return res
+
+    async def _full_integration_async(self, group_name:str, input_data:Any, enable_prediction:bool, enable_monitoring:bool, rule_timeout:Optional[float], codon:Optional[str])->Dict[str,Any]:
+        codon_mode=codon; codon,blocked=self._integration_prelude(group_name,input_data,enable_prediction,codon_mode)
+        if blocked is not None: return blocked
+        loop=asyncio.get_running_loop()
+        if self.current_direction==FlowDirection.BOTTOM_UP:
+            res=await loop.run_in_executor(self._get_pool("thread"), self.execute_bottom_up, input_data)
+        elif self.current_direction==FlowDirection.BIDIRECTIONAL:
+            top=await self.execute_top_down_async(group_name,input_data,rule_timeout)
+            bot=await loop.run_in_executor(self._get_pool("thread"), self.execute_bottom_up, top["output"])
+            res={"success": top["success"] and bot["success"], "output": bot["output"], "top_down": top, "bottom_up": bot}
+        else:
+            res=await self.execute_top_down_async(group_name,input_data,rule_timeout)
+        return self._integration_finish(group_name,res,codon,enable_monitoring,codon_mode)
+
+    async def _call_rule_async(self, rule:Rule, cur:_Carrier, timeout:Optional[float])->Any:
+        to=timeout
+        if asyncio.iscoroutinefunction(rule.function): aw=rule.function(cur.payload)
+        elif rule.metadata.get("cpu_bound"): aw=asyncio.get_running_loop().run_in_executor(self._get_pool("thread"), lambda: self._run_cpu_bound(rule,cur,to).payload)
+        elif to is None: aw=asyncio.get_running_loop().run_in_executor(self._get_pool("thread"), rule.function, cur.payload)
+        else:
+            fut=self._get_pool("watchdog").submit(rule.function,cur.payload)
+            try: return await asyncio.wait_for(asyncio.wrap_future(fut),to)
+            except asyncio.TimeoutError: self._abandon(fut); raise
+        return await (asyncio.wait_for(aw,to) if to is not None else aw)
+
+    # ---- 11. 스트림 ----
+    def execute_stream(self, group_name:str, items:Iterable[Any], window:int=100, integrate:bool=True)->Iterator[Dict[str,Any]]:
+        """
+        무한 입력(로그 tail 등)을 항목 단위로 처리해 결과를 지연 yield하는 제너레이터.
+        소비자가 이전 결과를 가져가야 다음 항목을 당겨오며(backpressure), 최근 window개 항목의
+        규칙 속도로 누적 속도를 유지한다. 메모리 사용은 스트림 길이와 무관하다.
+        """
+        if window<=0: raise ValueError("window must be positive")
+        custom=bool(self.velocity_calculator or _ext_cumulative)
+        recent:deque=deque()  # 항목별 부분 누적기 또는 (custom) 속도 목록
+        acc=_Accumulator()
+        for idx,item in enumerate(items):
+            res=self.execute_with_full_integration(group_name,item) if integrate else self.execute_top_down(group_name,item)
+            vs=[m.get("velocity",0.0) for m in ExecutionHistory._metrics_of(res) if m.get("status") not in (ExecutionStatus.FAILED,ExecutionStatus.TIMEOUT)]
+            if custom:
+                recent.append(vs)
+                if len(recent)>window: recent.popleft()
+                flat=[v for part in recent for v in part]
+                cum=self.calculate_cumulative_velocity(flat) if flat else 0.0
+            else:
+                part=_Accumulator(vs); recent.append(part); acc.merge(part)
+                if len(recent)>window: acc.subtract(recent.popleft())
+                cum=acc.value()
+            res["stream_index"]=idx; res["window_size"]=len(recent)
+            res["window_cumulative_velocity"]=cum; res["window_cap_exceeded"]=cum>=self.config.cumulative_cap
+            yield res
+
     # ========= 내부 헬퍼 =========
     def _get_group(self,name:str)->RuleGroup:
         if name not in self.groups: raise KeyError(f"group not found: {name}")
@@ -420,6 +1454,96 @@ class CosmosPROEngine:
         return out
     def _deps_ok(self,rule:Rule, done:set)->bool:
         return all(d in done for d in rule.dependencies)
+    def _check_plan_signature(self)->Tuple:
+        sig=(self._rules_version,)+self._threshold_key()
+        if sig!=self._plan_sig: self._plans.clear(); self._plan_sig=sig; self._rebuild_thresholds()
+        return sig
+    def _get_pool(self,kind:str,max_workers:Optional[int]=None)->Executor:
+        """(종류, 크기)별 공유 풀. 다른 호출이 아직 쓰고 있을 수 있으므로 크기가 달라도 기존 풀은 닫지 않음"""
+        if kind not in ("thread","process","watchdog"): raise ValueError(f"unsupported executor: {kind}")
+        key=_pool_key(kind,max_workers); pool=self._pools.get(key)
+        if pool is None:
+            if kind=="watchdog": pool=ThreadPoolExecutor(max_workers=max_workers or _WATCHDOG_WORKERS,thread_name_prefix="cosmos-watchdog")
+            elif kind=="thread": pool=ThreadPoolExecutor(max_workers=max_workers,thread_name_prefix="cosmos-dag")
+            else: pool=ProcessPoolExecutor(max_workers=max_workers)
+            new,pool=pool,self._pools.setdefault(key,pool)
+            if pool is not new: new.shutdown(wait=False)  # 동시에 만든 쪽이 이미 등록됨 (새 풀은 아직 빈 풀)
+        return pool
+    def _deadline_at(self,group_name:str,deadline:Optional[float])->Optional[float]:
+        if deadline is None: deadline=self._get_group(group_name).metadata.get("deadline")
+        return None if deadline is None else perf_counter()+float(deadline)
+    def _timeout_for(self,rule:Rule,deadline_at:Optional[float],default:Optional[float]=None)->Optional[float]:
+        """규칙 제한 시간(metadata["timeout"] > timeout_seconds > default > 엔진 rule_timeout)과 그룹 마감까지 남은 시간 중 작은 값"""
+        to=rule.metadata.get("timeout",getattr(rule,"timeout_seconds",None))
+        if to is None: to=default if default is not None else self.rule_timeout
+        if deadline_at is not None:
+            left=max(0.0,deadline_at-perf_counter()); to=left if to is None else min(float(to),left)
+        return to
+    def _invoke(self,rule:Rule,cur:_Carrier,timeout:Optional[float]=None)->_Carrier:
+        """
+        규칙 실행. timeout이 있으면 감시 스레드 풀(cpu_bound는 프로세스 풀)에서 실행하고 초과 시 RuleTimeout.
+        시간이 지난 스레드는 강제 종료할 수 없어 결과를 버리고 계속 진행하며(_abandon), 프로세스 풀은 워커를 종료한다.
+        """
+        if rule.metadata.get("cpu_bound"): return self._run_cpu_bound(rule,cur,timeout)
+        if timeout is None: return _Carrier(rule.function(cur.payload))
+        fut=self._get_pool("watchdog").submit(rule.function,cur.payload)
+        try: return _Carrier(fut.result(timeout=timeout))
+        except FutureTimeout:
+            self._abandon(fut); raise RuleTimeout(f"rule '{rule.key}' timed out after {timeout:.3g}s") from None
+    def _abandon(self,fut:Future)->None:
+        """
+        시간 초과로 버린 감시 스레드 작업을 기록. 시작 전이면 취소로 끝나고, 현재 감시 풀 스레드의 절반이
+        버린 작업에 묶이면 그 풀을 은퇴시키고(스레드는 끝날 때까지 돌다 종료) 다음 규칙은 새 풀에서 돈다.
+        """
+        if fut.cancel(): return
+        with self._watchdog_lock:
+            self._abandoned_total+=1; pool=self._pools.get("watchdog")
+            self._abandoned={f:p for f,p in self._abandoned.items() if not f.done()}
+            if pool is None: return
+            self._abandoned[fut]=pool
+            if sum(p is pool for p in self._abandoned.values())*2>=getattr(pool,"_max_workers",_WATCHDOG_WORKERS):
+                if self._pools.get("watchdog") is pool: self._pools.pop("watchdog")
+                pool.shutdown(wait=False); self._watchdog_retired+=1
+    def watchdog_stats(self)->Dict[str,int]:
+        with self._watchdog_lock:
+            running=sum(not f.done() for f in self._abandoned)
+        return {"abandoned_running":running,"abandoned_total":self._abandoned_total,"pools_retired":self._watchdog_retired}
+    def _run_cpu_bound(self,rule:Rule,cur:_Carrier,timeout:Optional[float]=None)->_Carrier:
+        """
+        metadata["cpu_bound"] 규칙을 웜 프로세스 풀에서 실행. 수치 입력/출력은 공유 메모리 블록으로 오가며
+        (규칙은 ndarray를 받는다) 워커 오류/크래시는 예외로 올라와 호출부의 FAILED+폴백 처리를 그대로 탄다.
+        """
+        pool=self._get_pool("process")
+        if not isinstance(cur.payload,(np.ndarray,list,tuple)) or cur.array.dtype.kind not in "biuf":
+            fut=pool.submit(rule.function,cur.payload); blk=None
+        else:
+            a=np.ascontiguousarray(cur.array); blk=shared_memory.SharedMemory(create=True,size=max(1,a.nbytes))
+            np.ndarray(a.shape,dtype=a.dtype,buffer=blk.buf)[...]=a
+            fut=pool.submit(_shm_call,rule.function,blk.name,a.shape,a.dtype.str)
+        try:
+            res=fut.result(timeout=timeout)
+        except FutureTimeout:
+            self._kill_process_pool()
+            raise RuleTimeout(f"rule '{rule.key}' timed out after {timeout:.3g}s") from None
+        except BrokenExecutor:
+            self._pools.pop("process",None); raise
+        finally:
+            if blk is not None: blk.close(); blk.unlink()
+        if blk is None: return _Carrier(res)
+        kind,val=res
+        if kind=="obj": return _Carrier(val)
+        name,shape,dtype=val; out=shared_memory.SharedMemory(name=name)
+        try: arr=np.ndarray(shape,dtype=np.dtype(dtype),buffer=out.buf).copy()
+        finally: out.close(); out.unlink()
+        return _Carrier(arr, arr if arr.dtype==np.float64 else None)
+    def _kill_process_pool(self)->None:
+        """시간 초과 워커가 든 프로세스 풀을 종료하고 버린다(다음 cpu_bound 호출 때 새 풀 생성)"""
+        pool=self._pools.pop("process",None)
+        if pool is None: return
+        for proc in list((getattr(pool,"_processes",None) or {}).values()):
+            try: proc.terminate()
+            except Exception: pass
+        pool.shutdown(wait=False,cancel_futures=True)
     def _note(self,etype:str, lvl:str, msg:str, *, rule_key:str, layer:Layer, **meta):
         try: self.monitor_execution(rule_key, etype, lvl, msg, layer=layer, **meta)
         except Exception: pass
@@ -0,0 +1,77 @@
+"""
+COSMOS-HGP Engine Pool
+테넌트(API 키)별 CosmosPROEngine 풀 (LRU + 메모리 상한 + 유휴 축출)
+"""
+
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Dict, List, Optional
+import threading
+
+try:
+    from .cosmos_pro_engine import CosmosPROEngine, DualityMode, Rule, RuleGroup, VelocityConfig
+except ImportError:
+    from cosmos_pro_engine import CosmosPROEngine, DualityMode, Rule, RuleGroup, VelocityConfig
+
+class EnginePool:
+    """
+    테넌트(API 키)별 CosmosPROEngine. 엔진은 첫 요청 때 공유 규칙/그룹과 템플릿이 미리 컴파일한 계획으로
+    만들며 설정은 쓰기 시 복사하고 임계값 원본(velocity_policy)은 모든 테넌트가 공유한다.
+    최대 엔진 수, 추정 메모리 합(max_bytes), 유휴 시간(idle_ttl) 초과 시 LRU 축출.
+    메모리 합은 누계로 유지하며 엔진별 추정치는 생성/조회 때 갱신한다(조회마다 모든 엔진을 다시 재지 않음).
+    """
+    def __init__(self, rules:List[Rule], groups:Dict[str,RuleGroup], config:VelocityConfig,
+                 max_engines:int=256, max_bytes:int=256<<20, idle_ttl:Optional[float]=None, **engine_kwargs):
+        self.rules=tuple(rules); self.groups=dict(groups); self.config=config
+        self.max_engines=max_engines; self.max_bytes=max_bytes; self.idle_ttl=idle_ttl; self.engine_kwargs=engine_kwargs
+        self._engines:OrderedDict=OrderedDict(); self._lock=threading.Lock(); self._bytes=0  # 값: [최근 사용 시각, 엔진, 추정 바이트]
+        self.hits=self.misses=self.evictions=0
+        self._template=self._build(False)
+        for m in DualityMode:
+            for g in self.groups: self._template.compile_plan(g,m)
+
+    def _build(self, share:bool)->CosmosPROEngine:
+        kw=dict(self.engine_kwargs)
+        if share: kw.setdefault("velocity_policy",self._template.velocity_policy)
+        return CosmosPROEngine(list(self.rules), dict(self.groups), self.config, share_config=share, **kw)
+
+    def get(self, tenant:str)->CosmosPROEngine:
+        with self._lock:
+            now=monotonic(); ent=self._engines.get(tenant)
+            if ent is not None:
+                self._engines.move_to_end(tenant); ent[0]=now; self.hits+=1
+                nb=ent[1].estimated_bytes(); self._bytes+=nb-ent[2]; ent[2]=nb
+                self._evict(now,keep=tenant); return ent[1]
+            self.misses+=1
+            eng=self._build(True)
+            eng._plans=dict(self._template._plans); eng._plan_sig=self._template._plan_sig  # 같은 규칙/설정이면 계획 공유
+            eng._rebuild_thresholds(self._template.threshold_table)  # 불변 임계값 표도 공유
+            nb=eng.estimated_bytes(); self._engines[tenant]=[now,eng,nb]; self._bytes+=nb
+            self._evict(now,keep=tenant)
+            return eng
+
+    def evict(self, tenant:str)->bool:
+        with self._lock:
+            ent=self._engines.pop(tenant,None)
+            if ent is None: return False
+            self._bytes-=ent[2]; self.evictions+=1
+        ent[1].shutdown_pools(wait_for=False); return True
+
+    def _evict(self, now:float, keep:str)->None:
+        def drop(k:str)->None:
+            _,eng,nb=self._engines.pop(k); self._bytes-=nb; eng.shutdown_pools(wait_for=False); self.evictions+=1
+        if self.idle_ttl is not None:
+            for k in [k for k,(t,_,_) in self._engines.items() if now-t>self.idle_ttl and k!=keep]: drop(k)
+        while len(self._engines)>self.max_engines or (len(self._engines)>1 and self._bytes>self.max_bytes):
+            k=next(iter(self._engines))
+            if k==keep: break
+            drop(k)
+
+    def total_bytes(self)->int: return self._bytes
+    def __contains__(self, tenant:object)->bool: return tenant in self._engines
+    def __len__(self)->int: return len(self._engines)
+
+    def stats(self)->Dict[str,Any]:
+        with self._lock:
+            return {"engines":len(self._engines),"bytes":self.total_bytes(),"max_engines":self.max_engines,
+                    "max_bytes":self.max_bytes,"hits":self.hits,"misses":self.misses,"evictions":self.evictions}
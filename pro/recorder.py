@@ -0,0 +1,75 @@
+"""
+COSMOS-HGP Execution Recorder
+execute_with_full_integration 호출 기록/재생용 이진 로그 (쓰기: ExecutionRecorder, 읽기: read_capture)
+"""
+
+import json
+import os
+import struct
+import threading
+from time import time
+from typing import Any, Dict, Iterator, Tuple
+
+import numpy as np
+
+_CAPTURE_MAGIC=b"CPRL\x00\x01"
+_U32=struct.Struct("<I")
+
+def _pack_value(x:Any)->Tuple[Dict[str,Any],bytes]:
+    """수치 배열/리스트는 원시 버퍼로, 그 외는 JSON으로 -> (설명, 바이트)"""
+    if isinstance(x,(np.ndarray,list,tuple)):
+        try: a=np.ascontiguousarray(x)
+        except Exception: a=None
+        if a is not None and a.dtype.kind in "biuf" and a.ndim>=1:
+            return {"kind":"ndarray" if isinstance(x,np.ndarray) else "list","dtype":a.dtype.str,"shape":list(a.shape)}, a.tobytes()
+    return {"kind":"json"}, json.dumps(x,default=str).encode("utf-8")
+
+def _unpack_value(desc:Dict[str,Any], buf:bytes)->Any:
+    if desc["kind"]=="json": return json.loads(buf.decode("utf-8"))
+    a=np.frombuffer(buf,dtype=np.dtype(desc["dtype"])).reshape(desc["shape"]).copy()
+    return a if desc["kind"]=="ndarray" else a.tolist()
+
+class ExecutionRecorder:
+    """
+    execute_with_full_integration 호출을 이진 로그로 기록. 파일은 매직 헤더 뒤에 [u32 길이][레코드]가 이어지며
+    레코드는 [u32 헤더 길이][JSON 헤더(그룹/모드/방향/규칙 버전/속도…)][입력 버퍼][출력 버퍼]이다.
+    """
+    def __init__(self, path:str, append:bool=True):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fresh=not (append and os.path.exists(path) and os.path.getsize(path)>0)
+        self.path=path; self._f=open(path,"ab" if append else "wb"); self._lock=threading.Lock(); self.count=0
+        if fresh: self._f.write(_CAPTURE_MAGIC)
+
+    def write(self, engine:Any, group_name:str, input_data:Any, options:Dict[str,Any], result:Dict[str,Any], duration_ms:float)->None:
+        ind,ib=_pack_value(input_data); outd,ob=_pack_value(result.get("output"))
+        grp=engine.groups.get(group_name)
+        rules={k:str(engine.rules[k].metadata.get("version","")) for k in (engine._flatten(grp.structure) if grp else []) if k in engine.rules}
+        head={"t":time(),"group":group_name,"mode":engine.current_mode.name,"direction":engine.current_direction.name,
+              "rules_version":engine._rules_version,"rules":rules,"options":options,"duration_ms":duration_ms,
+              "success":bool(result.get("success")),"blocked_by_predictor":bool(result.get("blocked_by_predictor")),
+              "cumulative_velocity":float(result.get("cumulative_velocity") or 0.0),
+              "velocities":[[m.get("rule_key",""),float(m.get("velocity") or 0.0)] for m in engine.execution_history._metrics_of(result)],
+              "input":{**ind,"nbytes":len(ib)},"output":{**outd,"nbytes":len(ob)}}
+        hb=json.dumps(head,ensure_ascii=False,default=str).encode("utf-8")
+        with self._lock:
+            self._f.write(_U32.pack(_U32.size+len(hb)+len(ib)+len(ob))); self._f.write(_U32.pack(len(hb)))
+            self._f.write(hb); self._f.write(ib); self._f.write(ob); self.count+=1
+
+    def close(self)->None:
+        with self._lock:
+            if not self._f.closed: self._f.close()
+
+def read_capture(path:str)->Iterator[Dict[str,Any]]:
+    """ExecutionRecorder 로그를 레코드 단위로 지연 해석 (헤더 dict + input/output_value). 잘린 꼬리 레코드는 무시"""
+    with open(path,"rb") as f:
+        if f.read(len(_CAPTURE_MAGIC))!=_CAPTURE_MAGIC: raise ValueError(f"not a capture file: {path}")
+        while True:
+            raw=f.read(_U32.size)
+            if len(raw)<_U32.size: return
+            (n,)=_U32.unpack(raw); body=f.read(n)
+            if len(body)<n: return
+            (hl,)=_U32.unpack_from(body); head=json.loads(body[_U32.size:_U32.size+hl].decode("utf-8"))
+            i=_U32.size+hl; ni=head["input"]["nbytes"]
+            head["input_value"]=_unpack_value(head["input"],body[i:i+ni])
+            head["output_value"]=_unpack_value(head["output"],body[i+ni:i+ni+head["output"]["nbytes"]])
+            yield head
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+COSMOS-HGP Request Coalescer
+============================
+
+/api/cosmos/execute 동시 요청 묶음 처리기 (micro-batching).
+
+Flask 없이도 가져올 수 있도록 통합 시스템(cosmos_integration_system.py)과 분리해 두었습니다.
+"""
+
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+_execution_seq = itertools.count(1)
+
+
+def next_execution_id() -> str:
+    """
+    프로세스 전체에서 고유한 실행 id (exec_<밀리초>_<일련번호>)
+
+    같은 밀리초에 끝난 단일 요청이나 배치끼리도 일련번호로 구분됩니다.
+    """
+    return f"exec_{int(time.time() * 1000)}_{next(_execution_seq)}"
+
+
+class _PendingRequest:
+    """코얼레서에 대기 중인 단일 요청"""
+    __slots__ = ('input_data', 'options', 'submitted', 'done', 'result', 'error')
+
+    def __init__(self, input_data: List[Any], options: Dict):
+        self.input_data = input_data
+        self.options = options
+        self.submitted = time.perf_counter()
+        self.done = threading.Event()
+        self.result: Optional[Dict] = None
+        self.error: Optional[BaseException] = None
+
+
+class RequestCoalescer:
+    """
+    동시 실행 요청 묶음 처리기 (micro-batching)
+
+    같은 (group, profile) 요청을 window_ms 동안 또는 항목 수가 max_items에 이를 때까지 모은 뒤
+    runner로 한 번에 실행하고, 결과를 각 호출자에게 되돌려줍니다. 창을 연 첫 요청(리더)이
+    대기 후 배치를 실행 풀에 넘기며, 각 호출자는 자신의 timeout 동안만 기다립니다.
+    """
+
+    def __init__(self, runner: Callable[[str, str, List[List[Any]], List[Dict]], List[Dict]],
+                 window_ms: float = 2.0, max_items: int = 256, timeout_s: float = 5.0,
+                 max_workers: int = 4, sample_size: int = 1024):
+        """
+        Args:
+            runner: (group, profile, inputs, options_list) -> 요청별 결과 목록
+            window_ms: 배치를 모으는 최대 시간 (밀리초)
+            max_items: 이 항목 수(입력 원소 합)에 이르면 창을 즉시 닫음
+            timeout_s: 요청별 대기 한도 (초, 클라이언트가 요청한 값은 이 값으로 제한됨)
+            max_workers: 배치 실행 스레드 수
+            sample_size: 배치 크기/대기 지연 통계에 보관할 최근 표본 수
+        """
+        self.runner = runner
+        self.window_s = window_ms / 1000.0
+        self.max_items = max_items
+        self.timeout_s = timeout_s
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cosmos-coalesce')
+        self._lock = threading.Lock()
+        self._open: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._batch_sizes: deque = deque(maxlen=sample_size)
+        self._queue_delays_ms: deque = deque(maxlen=sample_size)
+        self.batches = 0
+        self.requests = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def resolve_timeout(self, requested: Any = None) -> float:
+        """
+        클라이언트가 요청한 대기 한도를 검증
+
+        양의 유한한 숫자만 받아들이고 timeout_s를 넘으면 timeout_s로 자릅니다.
+        숫자가 아니거나(문자열, bool 포함) 0 이하/NaN이면 timeout_s를 씁니다.
+        """
+        if isinstance(requested, bool) or not isinstance(requested, (int, float)):
+            return self.timeout_s
+        requested = float(requested)
+        if math.isnan(requested) or requested <= 0:
+            return self.timeout_s
+        return min(requested, self.timeout_s)
+
+    def submit(self, group: str, profile: str, input_data: List[Any],
+               options: Optional[Dict] = None, timeout: Any = None) -> Dict:
+        """
+        요청을 배치에 넣고 결과를 기다림
+
+        Raises:
+            TimeoutError: resolve_timeout(timeout) 안에 결과가 오지 않은 경우
+        """
+        wait_s = self.resolve_timeout(timeout)
+        key = (group, profile)
+        req = _PendingRequest(input_data, options or {})
+        with self._lock:
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = {'requests': [], 'items': 0, 'full': threading.Event()}
+            batch['requests'].append(req)
+            batch['items'] += len(input_data)
+            self.requests += 1
+            if batch['items'] >= self.max_items:
+                del self._open[key]
+                batch['full'].set()
+
+        if leader:
+            batch['full'].wait(self.window_s)
+            with self._lock:
+                if self._open.get(key) is batch:
+                    del self._open[key]
+            self._executor.submit(self._run_batch, group, profile, batch['requests'])
+
+        if not req.done.wait(wait_s):
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError(f"request not completed within {wait_s}s")
+        if req.error is not None:
+            raise req.error
+        return req.result
+
+    def _run_batch(self, group: str, profile: str, requests: List[_PendingRequest]):
+        """배치를 한 번 실행하고 결과를 요청별로 나눠줌"""
+        started = time.perf_counter()
+        try:
+            results = self.runner(group, profile, [r.input_data for r in requests], [r.options for r in requests])
+            for req, res in zip(requests, results):
+                req.result = res
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            for req in requests:
+                req.error = e
+        with self._lock:
+            self.batches += 1
+            self._batch_sizes.append(len(requests))
+            self._queue_delays_ms.extend((started - r.submitted) * 1000.0 for r in requests)
+        for req in requests:
+            req.done.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """배치 크기와 대기 지연(최근 표본 기준) 통계"""
+        with self._lock:
+            sizes = np.asarray(self._batch_sizes, dtype=float)
+            delays = np.asarray(self._queue_delays_ms, dtype=float)
+            stats = {
+                'window_ms': self.window_s * 1000.0,
+                'max_items': self.max_items,
+                'timeout_s': self.timeout_s,
+                'batches': self.batches,
+                'requests': self.requests,
+                'timeouts': self.timeouts,
+                'errors': self.errors,
+            }
+        stats['batch_size'] = {
+            'mean': float(sizes.mean()) if sizes.size else 0.0,
+            'max': int(sizes.max()) if sizes.size else 0,
+        }
+        stats['queue_delay_ms'] = {
+            'mean': float(delays.mean()) if delays.size else 0.0,
+            'p50': float(np.percentile(delays, 50)) if delays.size else 0.0,
+            'p99': float(np.percentile(delays, 99)) if delays.size else 0.0,
+            'max': float(delays.max()) if delays.size else 0.0,
+        }
+        return stats
+
+    def close(self):
+        """실행 풀 종료"""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,793 @@
+"""
+COSMOS PRO Engine Tests
+PRO 엔진 실행 경로 테스트
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pro.cosmos_pro_engine import (
+    CosmosPROEngine, Rule, RuleGroup, VelocityConfig, Layer, DualityMode, ExecutionStatus
+)
+from pro.engine_pool import EnginePool
+
+
+def _double(x): return [v * 2 for v in x]
+def _inc(x): return [v + 1 for v in x]
+def _explode(x): return [v * 50 for v in x]
+def _fragile(x):
+    if x[0] > 3:
+        raise ValueError("too large")
+    return [v + 0.01 for v in x]
+
+
+def make_engine(mode=DualityMode.INNOVATION):
+    rules = [
+        Rule("double", _double, Layer.L2_ATOMIC, metadata={"vectorized": True}),
+        Rule("inc", _inc, Layer.L3_MOLECULAR),
+        Rule("fragile", _fragile, Layer.L4_COMPOUND, fallback_rule="inc"),
+        Rule("explode", _explode, Layer.L5_ORGANIC, is_critical=True),
+        Rule("tail", _inc, Layer.L6_ECOSYSTEM),
+    ]
+    groups = {
+        "main": RuleGroup("main", ["double", ["inc", "fragile"], "explode", "tail"]),
+        "safe": RuleGroup("safe", ["double", "inc"]),
+    }
+    return CosmosPROEngine(rules, groups, VelocityConfig(mode=mode))
+
+
+def test_batch_matches_scalar_rows():
+    engine = make_engine()
+    X = np.random.RandomState(0).rand(20, 4) * 5
+    X[3] = 0.0
+    batch = engine.execute_batch("main", X.tolist())
+    for i, row in enumerate(X):
+        scalar = engine.execute_top_down("main", row.tolist())
+        assert bool(batch["success"][i]) == scalar["success"]
+        assert np.allclose(np.asarray(scalar["output"], dtype=float), batch["output"][i])
+        assert batch["cumulative_velocity"][i] == pytest.approx(scalar["cumulative_velocity"])
+        statuses = [batch["status_names"][c] for c in batch["status"][i] if c != 0]
+        assert statuses == [m["status"].value for m in scalar["metrics"]]
+
+
+def test_batch_columnar_shape():
+    engine = make_engine(DualityMode.INNOVATION)
+    batch = engine.execute_batch("safe", np.ones((8, 3)))
+    assert batch["output"].shape == (8, 3)
+    assert batch["velocity"].shape == (8, 2)
+    assert batch["rules"] == ["double", "inc"]
+    assert batch["success"].all()
+
+
+def test_batch_rejects_3d_input():
+    with pytest.raises(ValueError):
+        make_engine().execute_batch("safe", np.ones((2, 2, 2)))
+
+
+def test_plan_is_cached_and_invalidated():
+    engine = make_engine()
+    plan = engine.compile_plan("main")
+    assert engine.compile_plan("main") is plan
+    assert [r.key for r in plan.rules] == ["double", "inc", "fragile", "explode", "tail"]
+    assert plan.fallbacks[2].key == "inc"
+    engine.switch_duality_mode(DualityMode.STABILITY)
+    stable = engine.compile_plan("main")
+    assert stable is not plan and stable.thresholds[0] < plan.thresholds[0]
+    engine.update_velocity_config(layer_multipliers={Layer.L2_ATOMIC: 0.5})
+    assert engine.compile_plan("main").thresholds[0] == pytest.approx(stable.thresholds[0] * 0.5)
+    engine.register_rule(Rule("inc", _double, Layer.L3_MOLECULAR))
+    assert engine.compile_plan("main").rules[1].function is _double
+
+
+def test_plan_skips_unmet_dependencies():
+    engine = make_engine()
+    engine.register_rule(Rule("late", _inc, Layer.L1_QUANTUM, dependencies=["tail"]))
+    engine.groups["deps"] = RuleGroup("deps", ["late", "double", "tail"])
+    plan = engine.compile_plan("deps")
+    assert plan.skipped == ("late",)
+    assert [m["rule_key"] for m in engine.execute_top_down("deps", [1.0])["metrics"]] == ["double", "tail"]
+
+
+def _parse(x): return [abs(v) for v in x]
+def _mean_detector(x): return [sum(x) / len(x)] * len(x)
+def _max_detector(x): return [max(x)] * len(x)
+def _alert(x): return [max(a, b) for a, b in zip(x["mean"], x["max"])]
+def _exit_worker(x): os._exit(1)  # kills the process-pool worker running it
+
+
+def make_dag_engine(critical_mean=False):
+    rules = [
+        Rule("parse", _parse, Layer.L1_QUANTUM),
+        Rule("mean", _mean_detector, Layer.L2_ATOMIC, dependencies=["parse"], is_critical=critical_mean),
+        Rule("max", _max_detector, Layer.L2_ATOMIC, dependencies=["parse"]),
+        Rule("alert", _alert, Layer.L4_COMPOUND, dependencies=["mean", "max"], is_critical=True),
+        Rule("audit", _inc, Layer.L3_MOLECULAR, dependencies=["max"]),
+    ]
+    groups = {"aiops": RuleGroup("aiops", ["alert", "audit", "mean", "max", "parse"])}
+    return CosmosPROEngine(rules, groups, VelocityConfig(mode=DualityMode.INNOVATION))
+
+
+def test_dag_runs_fan_out_in_dependency_order():
+    engine = make_dag_engine()
+    result = engine.execute_dag("aiops", [1.0, -3.0, 2.0])
+    assert [m["rule_key"] for m in result["metrics"]] == ["parse", "mean", "max", "alert", "audit"]
+    alert = result["metrics"][3]
+    assert alert["status"] is ExecutionStatus.SUCCESS and alert["velocity"] < 0.5 and result["success"]
+    assert result["output"]["alert"] == [3.0] * 3
+    assert result["output"]["audit"] == [4.0] * 3
+    engine.shutdown_pools()
+
+
+def test_dag_pool_resizes_and_survives_crashed_workers():
+    engine = make_dag_engine()
+    engine.execute_dag("aiops", [1.0, 2.0], max_workers=2)
+    small = engine._pools["thread-2"]
+    engine.execute_dag("aiops", [1.0, 2.0], max_workers=3)
+    assert engine._pools["thread-3"]._max_workers == 3
+    # a pool another call may still be using is never shut down by a resize
+    assert engine._pools["thread-2"] is small and small.submit(sum, [1, 2]).result() == 3
+
+    engine.register_rule(Rule("max", _exit_worker, Layer.L2_ATOMIC, dependencies=["parse"]))
+    result = engine.execute_dag("aiops", [1.0, 2.0], executor="process", max_workers=1)
+    status = {m["rule_key"]: m["status"] for m in result["metrics"]}
+    assert status["max"] is ExecutionStatus.FAILED
+    assert set(status) == {"parse", "mean", "max", "alert", "audit"}
+    engine.shutdown_pools()
+
+
+def test_dag_critical_block_cancels_dependents_only():
+    engine = make_dag_engine(critical_mean=True)
+    engine.switch_duality_mode(DualityMode.STABILITY)
+    result = engine.execute_dag("aiops", [0.0, 0.0, 9.0])
+    assert not result["success"]
+    assert result["cancelled"] == ["alert"]
+    assert "audit" in result["outputs"]
+    engine.shutdown_pools()
+
+
+def test_dag_rejects_cycles():
+    engine = make_dag_engine()
+    engine.register_rule(Rule("parse", _parse, Layer.L1_QUANTUM, dependencies=["alert"]))
+    with pytest.raises(ValueError):
+        engine.compile_dag("aiops")
+
+
+def test_fingerprint_strategies():
+    data = [1.0, 2.0, 3.0]
+    hashes = {}
+    for name in ["sha256", "blake2b", "sampled", "none"]:
+        engine = make_engine()
+        engine.set_fingerprint(name)
+        hashes[name] = engine.execute_top_down("safe", data)["metrics"][0]["input_hash"]
+    assert len(hashes["sha256"]) == len(hashes["blake2b"]) == 16
+    assert hashes["blake2b"] == hashes["sampled"]
+    assert hashes["none"] == ""
+    with pytest.raises(ValueError):
+        make_engine().set_fingerprint("md5")
+
+
+def test_sampled_fingerprint_covers_large_arrays():
+    from pro.cosmos_pro_engine import _fp_sampled, _FP_SAMPLE_LIMIT
+    a = np.arange(_FP_SAMPLE_LIMIT * 4, dtype=float)
+    b = a.copy()
+    b[-1] += 1.0
+    assert _fp_sampled(a) != _fp_sampled(b)
+
+
+def test_history_is_bounded_and_columnar(tmp_path):
+    base = make_engine()
+    engine = CosmosPROEngine(list(base.rules.values()), base.groups, VelocityConfig(mode=DualityMode.INNOVATION),
+                    history_limit=3, event_limit=5)
+    for i in range(10):
+        engine.execute_with_full_integration("safe", [0.1, 0.2, 0.1 * i], enable_prediction=False)
+    assert len(engine.execution_history) == 3
+    assert len(engine._events) == 5
+    status = engine.get_comprehensive_status()
+    assert status["history_count"] == 3 and status["history"]["total"] == 10
+    last = engine.execution_history[-1]
+    assert [m["rule_key"] for m in last["metrics"]] == ["double", "inc"]
+    assert "output" not in last
+    report = tmp_path / "report.json"
+    engine.export_execution_report(str(report))
+    assert report.read_text(encoding="utf-8").count("rule_key") == 6
+
+
+def test_history_keeps_payloads_on_request():
+    from pro.cosmos_pro_engine import ExecutionHistory
+    history = ExecutionHistory(2, keep_payloads=True)
+    for i in range(3):
+        history.append({"success": True, "output": [i], "metrics": []})
+    assert [r["output"] for r in history] == [[1], [2]]
+    assert [r["output"] for r in history[-10:]] == [[1], [2]] and history[-1:][0]["output"] == [2]
+    assert history[::-1][0] is history[-1] and history[5:] == []
+
+
+def test_carrier_reuses_ndarray_payloads():
+    from pro.cosmos_pro_engine import _Carrier
+    arr = np.arange(4, dtype=float)
+    assert _Carrier(arr).array is arr
+    listed = _Carrier([1, 2, 3])
+    assert listed.array is listed.array
+
+
+def test_inplace_rule_velocity_uses_snapshot():
+    def scale_inplace(x):
+        x *= 3.0
+        return x
+    rules = [Rule("scale", scale_inplace, Layer.L2_ATOMIC, metadata={"inplace": True})]
+    engine = CosmosPROEngine(rules, {"g": RuleGroup("g", ["scale"])}, VelocityConfig())
+    result = engine.execute_top_down("g", np.ones(3))
+    assert result["metrics"][0]["velocity"] > 0.5
+
+
+def test_async_top_down_matches_sync():
+    import asyncio
+    engine = make_engine()
+    sync = engine.execute_top_down("main", [1.0, 2.0, 0.5])
+    result = asyncio.run(engine.execute_top_down_async("main", [1.0, 2.0, 0.5]))
+    assert result["output"] == sync["output"]
+    assert [m["status"] for m in result["metrics"]] == [m["status"] for m in sync["metrics"]]
+    engine.shutdown_pools()
+
+
+def test_async_awaits_coroutines_and_enforces_timeouts():
+    import asyncio
+
+    async def fetch(x):
+        await asyncio.sleep(0)
+        return [v + 0.1 for v in x]
+
+    async def hang(x):
+        await asyncio.sleep(10)
+        return x
+
+    rules = [
+        Rule("fetch", fetch, Layer.L7_COSMOS),
+        Rule("hang", hang, Layer.L7_COSMOS, fallback_rule="fetch", metadata={"timeout": 0.05}),
+    ]
+    engine = CosmosPROEngine(rules, {"io": RuleGroup("io", ["fetch", "hang"])}, VelocityConfig(mode=DualityMode.INNOVATION))
+    result = asyncio.run(engine.execute_with_full_integration_async("io", [1.0, 1.0], enable_prediction=False))
+    assert result["output"] == pytest.approx([1.2, 1.2])
+    assert result["metrics"][1]["error"] == "TimeoutError"
+    assert len(engine.execution_history) == 1
+
+
+def test_memo_cache_hits_are_marked_and_counted():
+    calls = []
+
+    def pure(x):
+        calls.append(1)
+        return [v * 2.0 for v in x]
+
+    rules = [Rule("pure", pure, Layer.L7_COSMOS, cache_ttl=60.0), Rule("inc", _inc, Layer.L3_MOLECULAR)]
+    engine = CosmosPROEngine(rules, {"g": RuleGroup("g", ["pure", "inc"])}, VelocityConfig(mode=DualityMode.INNOVATION))
+    first = engine.execute_top_down("g", [1.0, 2.0])
+    second = engine.execute_top_down("g", [1.0, 2.0])
+    assert len(calls) == 1
+    assert first["output"] == second["output"] == [3.0, 5.0]
+    assert [m["status"] for m in first["metrics"] + second["metrics"]] == [ExecutionStatus.SUCCESS] * 4
+    assert [m["cached"] for m in second["metrics"]] == [True, False]
+    assert second["metrics"][0]["velocity"] == first["metrics"][0]["velocity"]
+    stats = engine.get_comprehensive_status()["memo_cache"]
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+def test_memo_cache_expires_and_evicts():
+    from pro.cosmos_pro_engine import RuleMemoCache, _Carrier
+    cache = RuleMemoCache(max_entries=2)
+    rule = Rule("r", _inc, Layer.L1_QUANTUM, cache_ttl=1.0)
+    keys = [cache.key(rule, _Carrier([float(i)])) for i in range(3)]
+    for k in keys:
+        cache.put(k, 60.0, _Carrier([0.0]), 0.0)
+    assert cache.get(keys[0]) is None and cache.evictions == 1
+    cache.put(keys[0], -1.0, _Carrier([0.0]), 0.0)
+    assert cache.get(keys[0]) is None and cache.expired == 1
+    assert cache.key(rule, _Carrier({"a": 1})) is None
+    for payload in (["a"], [{"x": 1}], [[1.0], [1.0, 2.0]], ["1.5"], np.array(["a"], dtype=object)):
+        assert cache.key(rule, _Carrier(payload)) is None
+    assert cache.key(rule, _Carrier((1, 2.5))) is not None and cache.key(rule, _Carrier(np.arange(3))) is not None
+
+
+def test_memo_cache_is_cleared_when_rules_change():
+    engine = CosmosPROEngine([Rule("r", _inc, Layer.L3_MOLECULAR, cache_ttl=60.0)],
+                             {"g": RuleGroup("g", ["r"])}, VelocityConfig(mode=DualityMode.INNOVATION))
+    assert engine.execute_top_down("g", [1.0, 2.0])["output"] == [2.0, 3.0]
+    engine.register_rule(Rule("r", _double, Layer.L3_MOLECULAR, cache_ttl=60.0))
+    result = engine.execute_top_down("g", [1.0, 2.0])
+    assert result["output"] == [2.0, 4.0] and result["metrics"][0]["cached"] is False
+
+
+def test_stream_is_lazy_and_windowed():
+    pulled = []
+
+    def source():
+        for i in range(1000):
+            pulled.append(i)
+            yield [1.0, 2.0, 1.0 + i % 3]
+
+    engine = make_engine(DualityMode.INNOVATION)
+    stream = engine.execute_stream("safe", source(), window=4, integrate=False)
+    first = next(stream)
+    assert pulled == [0]
+    results = [first] + [next(stream) for _ in range(9)]
+    assert len(pulled) == 10
+    assert results[-1]["window_size"] == 4 and results[-1]["stream_index"] == 9
+    per_item = [1.0 - r["cumulative_velocity"] for r in results[-4:]]
+    assert results[-1]["window_cumulative_velocity"] == pytest.approx(1.0 - np.prod(per_item))
+
+
+def test_rule_profile_ranks_by_total_time():
+    import time
+
+    def slow(x):
+        time.sleep(0.005)
+        return x
+
+    rules = [Rule("slow", slow, Layer.L1_QUANTUM), Rule("fast", _inc, Layer.L7_COSMOS)]
+    engine = CosmosPROEngine(rules, {"g": RuleGroup("g", ["slow", "fast"])}, VelocityConfig())
+    for _ in range(5):
+        engine.execute_top_down("g", [1.0])
+    profile = engine.get_rule_profile(top_n=1)
+    assert [p["rule_key"] for p in profile] == ["slow"]
+    slow_stats = profile[0]
+    assert slow_stats["calls"] == 5
+    assert 5.0 <= slow_stats["p50_ms"] <= slow_stats["p99_ms"] <= slow_stats["max_ms"] * 1.0001
+    fast_stats = engine.get_rule_profile()[1]
+    assert fast_stats["block_rate"] == 1.0
+    assert engine.get_comprehensive_status()["rule_profile"][0]["rule_key"] == "slow"
+
+
+def _heavy(x):
+    return np.sqrt(np.asarray(x) ** 2 + 1.0)
+
+
+def _reject(x):
+    raise ValueError("bad input")
+
+
+def test_cpu_bound_rules_run_in_process_pool():
+    rules = [
+        Rule("heavy", _heavy, Layer.L7_COSMOS, metadata={"cpu_bound": True}),
+        Rule("crash", _exit_worker, Layer.L7_COSMOS, fallback_rule="inc", metadata={"cpu_bound": True}),
+        Rule("reject", _reject, Layer.L7_COSMOS, metadata={"cpu_bound": True}),
+        Rule("inc", _inc, Layer.L7_COSMOS),
+    ]
+    groups = {"cpu": RuleGroup("cpu", ["heavy", "crash", "reject"])}
+    engine = CosmosPROEngine(rules, groups, VelocityConfig(mode=DualityMode.INNOVATION))
+    result = engine.execute_top_down("cpu", [3.0, 4.0])
+    heavy, crash, reject = result["metrics"]
+    assert heavy["status"] is ExecutionStatus.SUCCESS
+    assert crash["status"] is ExecutionStatus.SUCCESS and crash["error"]
+    assert reject["status"] is ExecutionStatus.FAILED and "bad input" in reject["error"]
+    assert np.allclose(result["output"], np.sqrt(np.array([10.0, 17.0])) + 1.0)
+    assert engine.execute_top_down("cpu", [1.0])["metrics"][0]["status"] is not ExecutionStatus.FAILED
+    engine.shutdown_pools()
+
+
+class _CountingPredictor:
+    def __init__(self):
+        self.calls = 0
+
+    def predict_cascade(self, input_data, group):
+        from pro.cosmos_pro_engine import PredictionResult
+        self.calls += 1
+        return PredictionResult(0.1, "LOW", ["proceed"], confidence=0.9, should_block=False)
+
+    def record_execution(self, input_data, result):
+        pass
+
+    def get_risk_assessment(self, input_data):
+        return {}
+
+
+def test_prediction_and_codon_results_are_cached():
+    engine = make_engine()
+    engine.cascade_predictor = predictor = _CountingPredictor()
+    for _ in range(3):
+        res = engine.execute_with_full_integration("safe", [1.0, 2.0])
+    assert predictor.calls == 1
+    assert engine.codon_cache.stats()["hits"] == 2
+    res["codon_analysis"]["codons"] = ["mutated"]
+    assert engine.execute_with_full_integration("safe", [1.0, 2.0])["codon_analysis"]["codons"] != ["mutated"]
+    engine.update_prediction_model({"input": [1.0, 2.0]})
+    engine.execute_with_full_integration("safe", [1.0, 2.0])
+    assert predictor.calls == 2
+    status = engine.get_comprehensive_status()
+    assert status["prediction_cache"]["entries"] == 1
+
+
+def test_codon_analysis_can_be_lazy_or_skipped():
+    engine = make_engine()
+    lazy = engine.execute_with_full_integration("safe", [1.0, 2.0], codon="lazy")
+    assert engine.codon_cache.stats()["misses"] == 0
+    assert "codon_analysis" not in dict(lazy)
+    assert lazy["codon_analysis"]["metadata"] is not None
+    assert engine.codon_cache.stats()["misses"] == 1
+    off = engine.execute_with_full_integration("safe", [1.0, 2.0], codon="off")
+    assert "codon_analysis" not in off and off["success"] == lazy["success"]
+    with pytest.raises(ValueError):
+        engine.execute_with_full_integration("safe", [1.0], codon="sometimes")
+
+
+def test_bidirectional_reuses_top_down_results():
+    calls = {}
+
+    def counted(key, fn):
+        def run(x):
+            calls[key] = calls.get(key, 0) + 1
+            return fn(x)
+        return run
+
+    rules = [
+        Rule("check", counted("check", lambda x: x), Layer.L1_QUANTUM),
+        Rule("guard", counted("guard", _explode), Layer.L2_ATOMIC, is_critical=True),
+        Rule("noisy", counted("noisy", _inc), Layer.L3_MOLECULAR, metadata={"pure": False}),
+        Rule("tail", counted("tail", _inc), Layer.L6_ECOSYSTEM),
+    ]
+    groups = {"g": RuleGroup("g", ["check", "guard", "noisy"])}
+    engine = CosmosPROEngine(rules, groups, VelocityConfig(mode=DualityMode.STABILITY))
+    res = engine.execute_bidirectional("g", [1.0, 2.0])
+    assert calls == {"check": 1, "guard": 1, "noisy": 1, "tail": 1}
+    assert res["bottom_up"]["reused"] == 2
+    assert [m["cached"] for m in res["bottom_up"]["metrics"]] == [True, True, False, False]
+
+    calls.clear()
+    plain = engine.execute_bidirectional("g", [1.0, 2.0], reuse=False)
+    assert calls == {"check": 2, "guard": 2, "noisy": 1, "tail": 1}
+    assert plain["output"] == res["output"]
+    assert [m["status"] for m in plain["bottom_up"]["metrics"]] == [m["status"] for m in res["bottom_up"]["metrics"]]
+
+    upper = engine.execute_bottom_up([1.0], start_layer=Layer.L3_MOLECULAR)
+    assert [m["rule_key"] for m in upper["metrics"]] == ["noisy", "tail"]
+    assert engine.compile_layer_order(Layer.L3_MOLECULAR).skipped == ("check", "guard")
+
+
+def test_bidirectional_reuse_distinguishes_list_and_ndarray_inputs():
+    rules = [
+        Rule("to_array", lambda x: np.asarray(x, dtype=float), Layer.L2_ATOMIC),
+        Rule("ident", lambda x: x, Layer.L3_MOLECULAR),
+    ]
+    engine = CosmosPROEngine(rules, {"g": RuleGroup("g", ["ident", "to_array"])}, VelocityConfig())
+    res = engine.execute_bidirectional("g", [1.0, 2.0])
+    # top-down saw a list; bottom-up sees an ndarray with the same values
+    assert res["bottom_up"]["reused"] == 0
+    assert isinstance(res["output"], np.ndarray) and res["output"].tolist() == [1.0, 2.0]
+
+
+def test_stream_export_appends_ndjson_and_flat_csv(tmp_path):
+    import csv
+    import gzip
+    import json
+
+    engine = make_engine()
+    for i in range(3):
+        engine.execute_with_full_integration("safe", [1.0 + i, 2.0], enable_prediction=False)
+    path = str(tmp_path / "report.ndjson.gz")
+    first = engine.export_execution_stream(path, append=True)
+    assert (first["records"], first["next_index"]) == (3, 3)
+    engine.execute_with_full_integration("main", [1.0, 2.0], enable_prediction=False)
+    second = engine.export_execution_stream(path, start=first["next_index"], append=True)
+    assert second["records"] == 1
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert [r["seq"] for r in lines] == [0, 1, 2, 3]
+    assert lines[0]["metrics"][0]["rule_key"] == "double"
+    assert isinstance(lines[0]["metrics"][0]["layer"], int)
+
+    csv_path = str(tmp_path / "report.csv")
+    out = engine.export_execution_stream(csv_path, format="csv", start=1, stop=3)
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert out["records"] == 2 and len(rows) == out["rows"] == 4
+    assert {r["seq"] for r in rows} == {"1", "2"} and rows[0]["rule_key"] == "double"
+    assert engine.export_execution_stream(csv_path, format="csv", since=10**12)["records"] == 0
+
+
+def test_engine_pool_isolates_tenants():
+    base = make_engine()
+    pool = EnginePool(list(base.rules.values()), base.groups, VelocityConfig(), max_engines=2)
+    a, b = pool.get("key-a"), pool.get("key-b")
+    assert pool.get("key-a") is a and a is not b
+    assert a._plans and a.compile_plan("main") is b.compile_plan("main")
+    a.switch_duality_mode(DualityMode.INNOVATION)
+    a.update_velocity_config(butterfly_factor=1.4, layer_multipliers={Layer.L2_ATOMIC: 0.5})
+    assert b.current_mode is DualityMode.STABILITY and b.config.butterfly_factor == 1.0
+    assert b.config.layer_multipliers == {} and pool.config.butterfly_factor == 1.0
+    assert a.compile_plan("main").thresholds != b.compile_plan("main").thresholds
+    pool.get("key-a")
+    pool.get("key-c")
+    assert "key-b" not in pool and "key-a" in pool and pool.stats()["evictions"] == 1
+    assert pool.get("key-b") is not b
+
+
+def test_engine_pool_memory_cap_and_idle_eviction():
+    base = make_engine()
+    pool = EnginePool(list(base.rules.values()), base.groups, VelocityConfig(), max_bytes=1, idle_ttl=0.0)
+    pool.get("a")
+    pool.get("b")
+    assert len(pool) == 1 and "b" in pool
+    assert pool.stats()["bytes"] == pool.get("b").estimated_bytes() > 0
+
+
+def test_engine_pool_keeps_a_running_byte_total(monkeypatch):
+    import threading
+
+    base = make_engine()
+    pool = EnginePool(list(base.rules.values()), base.groups, VelocityConfig())
+    engines = [pool.get(f"t{i}") for i in range(20)]
+    engines[3].execute_top_down("safe", [1.0, 2.0])
+    pool.get("t3")
+    assert pool.total_bytes() == sum(e.estimated_bytes() for e in engines)
+
+    measured = []
+    monkeypatch.setattr(CosmosPROEngine, "estimated_bytes", lambda self: measured.append(self) or 0)
+    pool.get("t5")
+    assert measured == [engines[5]]  # a lookup only re-measures the tenant it returns
+
+    threads = [threading.Thread(target=pool.evict, args=(f"t{i}",)) for i in range(20) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(pool) == 0 and pool.stats()["evictions"] == 20 and pool.total_bytes() == 0
+
+
+def test_record_and_replay_capture(tmp_path):
+    from pro.recorder import read_capture
+
+    path = str(tmp_path / "capture.bin")
+    engine = make_engine()
+    engine.start_recording(path)
+    engine.execute_with_full_integration("main", [1, 2, 3], enable_prediction=False)
+    engine.switch_duality_mode(DualityMode.STABILITY)
+    engine.execute_with_full_integration("safe", np.array([0.5, 1.5]), enable_prediction=False)
+    engine.execute_with_full_integration("safe", {"k": "v"}, enable_prediction=False)
+    assert engine.stop_recording() == 3
+    engine.execute_with_full_integration("safe", [9.0], enable_prediction=False)
+
+    records = list(read_capture(path))
+    assert [r["mode"] for r in records] == ["INNOVATION", "STABILITY", "STABILITY"]
+    assert records[0]["input_value"] == [1, 2, 3]
+    assert isinstance(records[1]["input_value"], np.ndarray) and records[2]["input_value"] == {"k": "v"}
+    assert records[0]["velocities"][0][0] == "double"
+
+    fresh = make_engine()
+    fresh.switch_duality_mode(DualityMode.ADAPTIVE)
+    events = len(fresh._events)
+    report = fresh.replay_capture(path)
+    assert report["records"] == 3 and report["mismatches"] == 0 and report["throughput_per_s"] > 0
+    assert fresh.current_mode is DualityMode.ADAPTIVE
+    assert fresh.execution_history.total == 0 and fresh.get_rule_profile() == []
+    assert fresh.memo_cache.stats()["misses"] == 0 and len(fresh._events) == events
+
+    changed = make_engine()
+    changed.register_rule(Rule("double", _inc, Layer.L2_ATOMIC))
+    report = changed.replay_capture(path)
+    assert report["mismatches"] >= 2 and "output" in report["diffs"][0]
+
+
+def test_replay_uses_the_engines_adjusted_velocity_policy(tmp_path):
+    velocity = pytest.importorskip("core_modules.velocity")
+    policy = velocity.VelocityPolicyManager()
+    policy.set_threshold(velocity.Layer.L2_ATOMIC, 0.9)
+    rules = [Rule("grow", lambda x: [v * 1.3 for v in x], Layer.L2_ATOMIC, is_critical=True)]
+    engine = CosmosPROEngine(rules, {"g": RuleGroup("g", ["grow"])}, VelocityConfig(mode=DualityMode.STABILITY),
+                             velocity_policy=policy, prediction_cache_decimals=3)
+    path = str(tmp_path / "capture.bin")
+    engine.start_recording(path)
+    recorded = engine.execute_with_full_integration("g", [1.0, 2.0], enable_prediction=False)
+    engine.stop_recording()
+    # the velocity sits between the default and the adjusted threshold
+    v = recorded["metrics"][0]["velocity"]
+    assert 0.20 * 0.7 <= v < 0.9 * 0.7 and recorded["success"]
+    report = engine.replay_capture(path)
+    assert report["records"] == 1 and report["mismatches"] == 0, report["diffs"]
+
+
+def test_top_down_resumes_from_checkpoint(tmp_path):
+    calls = []
+
+    def step(key, fail=None):
+        def run(x):
+            calls.append(key)
+            if fail and fail["on"]:
+                raise KeyboardInterrupt("worker restart")
+            return [v + 0.01 for v in x]
+        return run
+
+    crash = {"on": True}
+    rules = [
+        Rule("a", step("a"), Layer.L1_QUANTUM),
+        Rule("b", step("b"), Layer.L1_QUANTUM),
+        Rule("c", step("c", crash), Layer.L2_ATOMIC),
+        Rule("d", step("d"), Layer.L3_MOLECULAR),
+    ]
+    groups = {"g": RuleGroup("g", ["a", "b", "c", "d"])}
+    engine = CosmosPROEngine(rules, groups, VelocityConfig(mode=DualityMode.INNOVATION), checkpoint_dir=str(tmp_path))
+    with pytest.raises(KeyboardInterrupt):
+        engine.execute_top_down("g", [1.0, 2.0], execution_id="job-1")
+    assert calls == ["a", "b", "c"] and len(os.listdir(tmp_path)) == 1
+
+    crash["on"] = False
+    calls.clear()
+    res = engine.execute_top_down("g", [1.0, 2.0], execution_id="job-1")
+    assert calls == ["c", "d"] and res["resumed_from"] == 2
+    assert [m["rule_key"] for m in res["metrics"]] == ["a", "b", "c", "d"]
+    assert np.allclose(res["output"], [1.04, 2.04])
+    assert os.listdir(tmp_path) == []
+
+    crash["on"] = True
+    calls.clear()
+    with pytest.raises(KeyboardInterrupt):
+        engine.execute_top_down("g", [1.0], execution_id="job-2", checkpoint_every="layer")
+    crash["on"] = False
+    calls.clear()
+    assert engine.execute_top_down("g", [1.0], execution_id="job-2")["resumed_from"] == 2
+
+    crash["on"] = True
+    with pytest.raises(KeyboardInterrupt):
+        engine.execute_top_down("g", np.array([1.0, 2.0]), execution_id="job-3")
+    with np.load(os.path.join(tmp_path, os.listdir(tmp_path)[0]), allow_pickle=False) as saved:
+        assert np.allclose(saved["payload"], [1.02, 2.02])
+    crash["on"] = False
+    calls.clear()
+    res = engine.execute_top_down("g", np.array([5.0, 2.0]), execution_id="job-3")
+    assert "resumed_from" not in res and calls == ["a", "b", "c", "d"] and np.allclose(res["output"], [5.04, 2.04])
+
+
+def test_default_checkpoint_directory_must_be_private(tmp_path, monkeypatch):
+    import tempfile
+    from pro.checkpoint import CheckpointStore
+
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    store = CheckpointStore()
+    assert store.save("job", {"payload": {"k": [1, 2]}, "next": 1})
+    assert os.stat(store.directory).st_mode & 0o777 == 0o700
+    assert store.load("job") == {"payload": {"k": [1, 2]}, "next": 1}
+    assert not store.save("job", {"payload": object()})
+
+    os.chmod(store.directory, 0o777)
+    with pytest.raises(PermissionError):
+        CheckpointStore().load("job")
+
+
+def _stall(x):
+    import time
+    time.sleep(3)
+    return x
+
+
+def test_rule_timeouts_fall_back_and_are_counted():
+    rules = [
+        Rule("slow", _stall, Layer.L2_ATOMIC, fallback_rule="inc", metadata={"timeout": 0.1}),
+        Rule("stuck", _stall, Layer.L3_MOLECULAR),
+        Rule("inc", _inc, Layer.L3_MOLECULAR),
+        Rule("grind", _stall, Layer.L4_COMPOUND, metadata={"cpu_bound": True, "timeout": 0.3}),
+    ]
+    groups = {"g": RuleGroup("g", ["slow", "stuck"]), "cpu": RuleGroup("cpu", ["grind"]),
+              "budget": RuleGroup("budget", ["slow", "inc", "inc"], metadata={"deadline": 0.05})}
+    engine = CosmosPROEngine(rules, groups, VelocityConfig(mode=DualityMode.INNOVATION), rule_timeout=0.1)
+    res = engine.execute_top_down("g", [1.0, 2.0])
+    slow, stuck = res["metrics"]
+    assert slow["status"] is ExecutionStatus.SUCCESS and slow["timed_out"] and "timed out" in slow["error"]
+    assert stuck["status"] is ExecutionStatus.TIMEOUT and stuck["timed_out"]
+    assert res["output"] == [2.0, 3.0]
+    assert engine.get_comprehensive_status()["watchdog"]["abandoned_running"] == 2
+    profile = {p["rule_key"]: p for p in engine.get_rule_profile()}
+    assert profile["stuck"]["timeouts"] == 1 and profile["stuck"]["timeout_rate"] == 1.0
+
+    started = time.perf_counter()
+    grind = engine.execute_top_down("cpu", [1.0])["metrics"][0]
+    assert grind["status"] is ExecutionStatus.TIMEOUT and time.perf_counter() - started < 2.5
+    assert "process" not in engine._pools
+
+    own = CosmosPROEngine([Rule("own", _stall, Layer.L2_ATOMIC, timeout_seconds=0.05)],
+                          {"g": RuleGroup("g", ["own"])}, VelocityConfig())
+    started = time.perf_counter()
+    own_metric = own.execute_top_down("g", [1.0])["metrics"][0]
+    assert own_metric["status"] is ExecutionStatus.TIMEOUT and time.perf_counter() - started < 1.0
+
+    late = engine.execute_top_down("budget", [1.0])
+    assert late["deadline_exceeded"] and not late["success"]
+    assert late["skipped_rules"] == ["inc", "inc"]
+    assert engine.execute_top_down("budget", [1.0], deadline=10.0)["success"]
+    engine.shutdown_pools(wait_for=False)
+
+
+def test_stuck_watchdog_threads_do_not_starve_later_rules():
+    import threading
+
+    gate = threading.Event()
+    fallback_started = threading.Event()
+
+    def hang(x):
+        gate.wait(10)
+        return x
+
+    def mutate_late(x):
+        fallback_started.wait(5)
+        x.append(99.0)
+        return x
+
+    def fallback(x):
+        fallback_started.set()
+        time.sleep(0.05)
+        return [v + 1 for v in x]
+
+    rules = [Rule("hang", hang, Layer.L7_COSMOS, fallback_rule="fb", metadata={"timeout": 0.01}),
+             Rule("mutate", mutate_late, Layer.L7_COSMOS, fallback_rule="fb", metadata={"timeout": 0.01}),
+             Rule("fb", fallback, Layer.L7_COSMOS)]
+    groups = {"g": RuleGroup("g", ["hang"]), "m": RuleGroup("m", ["mutate"])}
+    engine = CosmosPROEngine(rules, groups, VelocityConfig(mode=DualityMode.INNOVATION))
+    assert engine.execute_top_down("m", [1.0])["output"] == [2.0]
+    for _ in range(40):
+        res = engine.execute_top_down("g", [1.0])
+        assert res["metrics"][0]["timed_out"] and res["output"] == [2.0]
+    stats = engine.get_comprehensive_status()["watchdog"]
+    assert stats["abandoned_total"] == 41 and stats["pools_retired"] == 1
+    gate.set()
+    deadline = time.perf_counter() + 5
+    while engine.watchdog_stats()["abandoned_running"] and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    assert engine.watchdog_stats()["abandoned_running"] == 0
+    engine.shutdown_pools()
+
+
+def test_threshold_table_is_shared_immutable_and_rebuilt_on_config_change():
+    engine = make_engine(DualityMode.STABILITY)
+    table = engine.threshold_table
+    assert table.values.shape == (len(table.profiles), len(DualityMode), len(Layer) + 1)
+    with pytest.raises(ValueError):
+        table.values[0, 0, 1] = 0.9
+    levels = [layer.level for layer in Layer]
+    gathered = engine.get_effective_thresholds(levels, DualityMode.INNOVATION)
+    assert gathered.tolist() == [engine.get_effective_threshold(layer, DualityMode.INNOVATION) for layer in Layer]
+
+    engine.update_velocity_config(butterfly_factor=1.6, layer_multipliers={Layer.L1_QUANTUM: 0.0})
+    assert engine.threshold_table is not table and table.values.flags.writeable is False
+    assert engine.get_effective_threshold(Layer.L1_QUANTUM) == engine.config.base_threshold
+    assert engine.get_effective_threshold(Layer.L2_ATOMIC, DualityMode.ADAPTIVE) == pytest.approx(0.20 * 1.3)
+    if "conservative" in table.profiles:
+        engine.update_velocity_config(profile="conservative")
+        assert engine.get_effective_threshold(Layer.L2_ATOMIC) == pytest.approx(0.20 * 0.8 * 0.7)
+    with pytest.raises(ValueError):
+        engine.update_velocity_config(profile="unknown")
+
+    pool = EnginePool(list(engine.rules.values()), engine.groups, VelocityConfig())
+    a, b = pool.get("a"), pool.get("b")
+    assert a.threshold_table is b.threshold_table
+    a.update_velocity_config(butterfly_factor=0.5)
+    assert a.threshold_table is not b.threshold_table
+
+
+def test_engines_read_the_velocity_managers_shared_table():
+    velocity = pytest.importorskip("core_modules.velocity")
+    policy = velocity.VelocityPolicyManager()
+    engine = make_engine(DualityMode.STABILITY)
+    engine.velocity_policy = policy
+    pool = EnginePool(list(engine.rules.values()), engine.groups, VelocityConfig(mode=DualityMode.STABILITY),
+                      velocity_policy=policy)
+    tenant = pool.get("t")
+    assert tenant.velocity_policy is policy
+
+    policy.set_threshold(velocity.Layer.L2_ATOMIC, 0.1)
+    for eng in (engine, tenant):
+        assert eng.get_effective_threshold(Layer.L2_ATOMIC) == pytest.approx(0.1 * 0.7)
+        metrics = eng.execute_top_down("safe", [0.1, 0.2])["metrics"]
+        assert metrics[0]["threshold"] == pytest.approx(0.1 * 0.7)
+
+    adaptive = velocity.AdaptiveThresholdManager()
+    adaptive.current_thresholds[velocity.Layer.L3_MOLECULAR] = 0.3
+    policy.apply_adaptive_thresholds(adaptive)
+    assert tenant.get_effective_threshold(Layer.L3_MOLECULAR) == pytest.approx(0.3 * 0.7)
+    tenant.update_velocity_config(profile="standard")  # a tenant can still pin a profile
+    assert tenant.get_effective_threshold(Layer.L3_MOLECULAR) == pytest.approx(0.26 * 0.7)
+
+    engine.config.butterfly_factor = 1.6  # direct mutation is picked up without compile_plan
+    assert engine.get_effective_threshold(Layer.L3_MOLECULAR, DualityMode.ADAPTIVE) == pytest.approx(0.3 * 1.3)
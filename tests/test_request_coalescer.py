@@ -0,0 +1,139 @@
+"""
+COSMOS Request Coalescer Tests
+요청 묶음 처리기 테스트
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import request_coalescer
+from request_coalescer import RequestCoalescer, next_execution_id
+
+
+def _scalar(group, profile, input_data, options):
+    return {'group': group, 'profile': profile, 'input': list(input_data),
+            'total': float(sum(input_data)), 'scale': options.get('scale', 1)}
+
+
+def _batch_runner(calls):
+    def run(group, profile, inputs, options_list):
+        calls.append(len(inputs))
+        return [_scalar(group, profile, x, o) for x, o in zip(inputs, options_list)]
+    return run
+
+
+def test_coalesced_results_match_scalar_calls():
+    calls = []
+    coalescer = RequestCoalescer(_batch_runner(calls), window_ms=50.0, max_items=10_000)
+    inputs = [[i, i + 1.5, -i] for i in range(8)]
+    results = [None] * len(inputs)
+
+    def worker(i):
+        results[i] = coalescer.submit('g', 'p', inputs[i], {'scale': i})
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(inputs))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    coalescer.close()
+
+    assert results == [_scalar('g', 'p', x, {'scale': i}) for i, x in enumerate(inputs)]
+    assert sum(calls) == len(inputs) and max(calls) > 1
+    stats = coalescer.get_stats()
+    assert stats['requests'] == len(inputs) and stats['batches'] == len(calls)
+    assert stats['timeouts'] == 0 and stats['errors'] == 0
+
+
+def test_timeout_is_validated_and_clamped_to_server_default():
+    coalescer = RequestCoalescer(_batch_runner([]), timeout_s=2.0)
+    assert coalescer.resolve_timeout(None) == 2.0
+    assert coalescer.resolve_timeout('0.5') == 2.0
+    assert coalescer.resolve_timeout(True) == 2.0
+    assert coalescer.resolve_timeout(float('nan')) == 2.0
+    assert coalescer.resolve_timeout(-1) == 2.0
+    assert coalescer.resolve_timeout(1e9) == 2.0
+    assert coalescer.resolve_timeout(0.25) == 0.25
+    coalescer.close()
+
+
+def test_slow_batch_times_out_and_is_counted():
+    release = threading.Event()
+
+    def slow(group, profile, inputs, options_list):
+        release.wait(5.0)
+        return [{'input': x} for x in inputs]
+
+    coalescer = RequestCoalescer(slow, window_ms=1.0, timeout_s=0.05)
+    started = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        coalescer.submit('g', 'p', [1.0], timeout=60.0)  # clamped to timeout_s
+    assert time.perf_counter() - started < 1.0
+    release.set()
+    coalescer.close()
+    assert coalescer.get_stats()['timeouts'] == 1
+
+
+def test_runner_errors_reach_every_caller():
+    def broken(group, profile, inputs, options_list):
+        raise ValueError('boom')
+
+    coalescer = RequestCoalescer(broken, window_ms=1.0)
+    with pytest.raises(ValueError):
+        coalescer.submit('g', 'p', [1.0])
+    coalescer.close()
+    assert coalescer.get_stats()['errors'] == 1
+
+
+def test_execution_ids_are_unique_within_one_millisecond(monkeypatch):
+    monkeypatch.setattr(request_coalescer.time, 'time', lambda: 1700000000.0)
+    ids = []
+    threads = [threading.Thread(target=lambda: ids.extend(next_execution_id() for _ in range(100)))
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(ids)) == 400 and all(i.startswith('exec_1700000000000_') for i in ids)
+
+
+def test_integration_batches_in_one_millisecond_get_distinct_ids(monkeypatch):
+    pytest.importorskip('flask')
+    pytest.importorskip('flask_socketio')
+    pytest.importorskip('flask_cors')
+    pytest.importorskip('pandas')
+    from cosmos_integration_system import CosmosIntegrationSystem
+
+    monkeypatch.setattr(request_coalescer.time, 'time', lambda: 1700000000.0)
+    system = CosmosIntegrationSystem()
+    first = system._execute_cosmos_logic_batch('g', 'p', [[1.0], [2.0]], [{}, {}])
+    second = system._execute_cosmos_logic_batch('g', 'p', [[3.0]], [{}])
+    ids = [r['execution_id'] for r in first + second]
+    assert len(set(ids)) == 3
+
+
+def test_integration_batch_matches_scalar_execution():
+    pytest.importorskip('flask')
+    pytest.importorskip('flask_socketio')
+    pytest.importorskip('flask_cors')
+    pytest.importorskip('pandas')
+    from cosmos_integration_system import CosmosIntegrationSystem
+
+    system = CosmosIntegrationSystem()
+    inputs = [[0.5, 12, -7, 'x', 3.3], [], [2, 2, 2, 2, 2, 2, 2, 2]]
+    batch = system._execute_cosmos_logic_batch('g', 'p', inputs, [{} for _ in inputs])
+    scalar = [system._execute_cosmos_logic('g', x, 'p', {}) for x in inputs]
+
+    assert len({r['execution_id'] for r in batch}) == len(inputs)
+    for b, s in zip(batch, scalar):
+        for key in ('total_impact', 'average_impact', 'blocked_count', 'cascade_depth'):
+            assert b['metrics'][key] == pytest.approx(s['metrics'][key])
+        for bs, ss in zip(b['metrics']['execution_path'], s['metrics']['execution_path']):
+            assert {k: v for k, v in bs.items() if k != 'timestamp'} == \
+                {k: v for k, v in ss.items() if k != 'timestamp'}
@@ -0,0 +1,213 @@
+"""
+COSMOS Velocity Policy Tests
+속도 정책 모듈 테스트
+"""
+
+import math
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core_modules.velocity import (
+    AdaptiveThresholdManager,
+    CumulativeVelocityAccumulator,
+    Layer,
+    QuantileSketch,
+    VelocityPolicyManager,
+)
+
+
+def _reference(velocities):
+    product = 1.0
+    for v in velocities:
+        product *= 1.0 - max(0.0, min(1.0, v))
+    return 1.0 - product
+
+
+def test_accumulator_matches_product_formula():
+    velocities = [0.1, 0.05, 0.3, 0.0, 0.2]
+    acc = CumulativeVelocityAccumulator()
+    for v in velocities:
+        acc.add(v)
+    assert acc.value() == pytest.approx(_reference(velocities), abs=1e-12)
+    assert CumulativeVelocityAccumulator(velocities).value() == pytest.approx(acc.value(), abs=1e-15)
+
+
+def test_accumulator_sliding_window_and_merge():
+    rng = np.random.default_rng(1)
+    stream = rng.random(5000) * 0.2
+    acc = CumulativeVelocityAccumulator()
+    for i, v in enumerate(stream):
+        acc.add(v)
+        if i >= 10:
+            acc.remove(stream[i - 10])
+    assert acc.value() == pytest.approx(_reference(stream[-10:]), abs=1e-9)
+    left, right = CumulativeVelocityAccumulator(list(stream[:7])), CumulativeVelocityAccumulator(list(stream[7:20]))
+    assert left.merge(right).value() == pytest.approx(_reference(stream[:20]), abs=1e-12)
+
+
+def test_accumulator_handles_saturation_and_invalid_values():
+    acc = CumulativeVelocityAccumulator([0.2, 1.5, float("nan"), "x"])
+    assert acc.count == 2 and acc.value() == 1.0
+    acc.remove(1.5)
+    assert acc.value() == pytest.approx(0.2)
+
+
+def test_policy_manager_cumulative_is_capped():
+    manager = VelocityPolicyManager()
+    assert manager.calculate_cumulative([0.1, 0.1]) == pytest.approx(_reference([0.1, 0.1]))
+    assert manager.calculate_cumulative([0.4, 0.4, float("inf")]) == manager.current_profile.cumulative_cap
+    assert manager.calculate_cumulative([math.nan]) == 0.0
+
+
+def test_breach_batch_matches_scalar_path():
+    scalar = VelocityPolicyManager("conservative")
+    batch = VelocityPolicyManager("conservative")
+    layers = list(Layer) * 3
+    rng = np.random.RandomState(1)
+    velocities = rng.rand(len(layers)) * 0.5
+    velocities[2] = np.nan
+    velocities[5] = np.inf
+    breached, thresholds = batch.check_velocity_breach_batch(np.array(layers, dtype=object), velocities)
+    for i, (layer, v) in enumerate(zip(layers, velocities)):
+        assert (bool(breached[i]), thresholds[i]) == scalar.check_velocity_breach(layer, float(v))
+    assert len(batch.breach_history) == len(scalar.breach_history)
+    assert len({b["timestamp"] for b in batch.breach_history}) == 1
+    assert [b["layer"] for b in batch.breach_history] == [b["layer"] for b in scalar.breach_history]
+
+    levels = np.array([layer.level for layer in layers])
+    again, _ = batch.check_velocity_breach_batch(levels, velocities)
+    assert np.array_equal(again, breached)
+    mixed, th = batch.check_velocity_breach_batch(Layer.L1_QUANTUM, np.array([0.9, "x", None], dtype=object))
+    assert mixed.tolist() == [True, False, False] and th.tolist()[1:] == [0.0, 0.0]
+    listed, _ = batch.check_velocity_breach_batch([Layer.L1_QUANTUM] * 2, [0.9, "x"])
+    assert listed.tolist() == [True, False]
+    grid, grid_th = batch.check_velocity_breach_batch(levels.reshape(3, 7), velocities.reshape(3, 7))
+    assert grid.shape == (3, 7) and np.array_equal(grid.ravel(), breached)
+    assert np.array_equal(grid_th.ravel(), thresholds)
+    with pytest.raises(ValueError):
+        batch.check_velocity_breach_batch(np.array([9]), [0.1])
+
+
+def test_impact_batch_matches_scalar_for_matrices_and_ragged_rows():
+    manager = VelocityPolicyManager()
+    rng = np.random.RandomState(2)
+    before = rng.randn(6, 4)
+    after = before * rng.rand(6, 1) * 3
+    before[1] = 0.0
+    after[1] = 0.0
+    before[2] = 0.0
+    after[3, 0] = np.nan
+    expected = [manager.calculate_impact(b, a) for b, a in zip(before, after)]
+    assert np.allclose(manager.calculate_impact_batch(before, after), expected)
+    assert np.allclose(manager.calculate_impact_batch(before, after, dtype=np.float32), expected, atol=1e-5)
+
+    rows_b = [rng.randn(k) for k in (3, 0, 5, 1)]
+    rows_a = [r + rng.randn(r.size) * 0.1 for r in rows_b]
+    offsets = np.cumsum([0] + [r.size for r in rows_b])
+    ragged = manager.calculate_impact_batch(np.concatenate(rows_b), np.concatenate(rows_a), offsets)
+    assert np.allclose(ragged, [manager.calculate_impact(b, a) for b, a in zip(rows_b, rows_a)])
+    with pytest.raises(ValueError):
+        manager.calculate_impact_batch(np.ones(4), np.ones(4), offsets=[0, 3])
+
+
+def test_breach_history_ring_keeps_running_aggregates():
+    manager = VelocityPolicyManager(breach_capacity=4)
+    threshold = manager.get_threshold(Layer.L1_QUANTUM)
+    for i in range(6):
+        manager.check_velocity_breach(Layer.L1_QUANTUM, threshold + 0.1 * (i + 1))
+    manager.check_velocity_breach_batch([Layer.L7_COSMOS] * 3, [9.0, 9.5, 0.0])
+    history = manager.breach_history
+    assert history.total == 8 and len(history) == 4
+    assert [b["layer"] for b in history] == [Layer.L1_QUANTUM.display_name] * 2 + [Layer.L7_COSMOS.display_name] * 2
+    assert history[-1]["velocity"] == 9.5 and history[0]["velocity"] == pytest.approx(threshold + 0.5)
+
+    stats = manager.get_breach_statistics()
+    assert stats["total_breaches"] == 8 and stats["max_velocity"] == 9.5
+    assert stats["breaches_by_layer"] == {Layer.L1_QUANTUM.display_name: 6, Layer.L7_COSMOS.display_name: 2}
+    assert stats["rates"]["1m"]["count"] == 8 and len(stats["recent_breaches"]) == 4
+    assert history.count_since(60, now=history._timestamp.max() + 120) == 0
+
+    manager.reset_breach_history()
+    assert len(manager.breach_history) == 0 and manager.get_breach_statistics()["total_breaches"] == 0
+
+
+def test_quantile_sketch_accuracy_merge_and_decay():
+    rng = np.random.RandomState(3)
+    impacts = rng.lognormal(-1.5, 0.6, 20000)
+    whole = QuantileSketch()
+    whole.update(impacts)
+    for q in (0.05, 0.5, 0.95):
+        assert whole.quantile(q) == pytest.approx(np.quantile(impacts, q), rel=0.03)
+    assert whole.mean == pytest.approx(impacts.mean())
+
+    left, right = QuantileSketch(), QuantileSketch()
+    left.update(impacts[:7000])
+    right.update(impacts[7000:])
+    merged = QuantileSketch.from_dict(left.to_dict()).merge(right)
+    assert merged.count == whole.count and merged.quantile(0.95) == whole.quantile(0.95)
+    with pytest.raises(ValueError):
+        merged.merge(QuantileSketch(relative_accuracy=0.05))
+
+    decayed = QuantileSketch(decay=0.5)
+    decayed.update(np.full(100, 0.1))
+    for _ in range(10):
+        decayed.update(np.full(100, 2.0))
+    assert decayed.quantile(0.05) == pytest.approx(2.0, rel=0.02)
+    assert decayed.samples == 1100 and decayed.count == pytest.approx(2.0)
+
+
+def test_adaptive_sketch_follows_recent_impacts_like_a_1000_sample_window():
+    rng = np.random.RandomState(5)
+    manager = AdaptiveThresholdManager()
+    for chunk in np.split(rng.uniform(0.3, 0.45, 5000), 100):
+        manager.update_threshold(Layer.L5_ORGANIC, chunk)
+    history = []
+    for chunk in np.split(rng.uniform(0.0, 0.1, 1000), 20):
+        manager.update_threshold(Layer.L5_ORGANIC, chunk)
+        history.extend(chunk)
+    sketch = manager.sketches[Layer.L5_ORGANIC]
+    assert sketch.quantile(0.95) == pytest.approx(np.quantile(history, 0.95), rel=0.1)
+    assert sketch.samples == 6000
+    assert manager.get_learning_statistics()["Organic"]["samples"] == 6000
+
+
+def test_adaptive_thresholds_merge_across_workers():
+    rng = np.random.RandomState(4)
+    impacts = rng.uniform(0.0, 0.1, 400)
+    # parallel streams merge exactly only without per-sample ageing
+    single, worker_a, worker_b = (AdaptiveThresholdManager(decay=1.0) for _ in range(3))
+    assert single.update_threshold(Layer.L2_ATOMIC, impacts[:10]) == Layer.L2_ATOMIC.threshold
+    single.update_threshold(Layer.L2_ATOMIC, impacts[10:])
+    worker_a.update_threshold(Layer.L2_ATOMIC, impacts[:10])
+    worker_b.update_threshold(Layer.L2_ATOMIC, impacts[10:])
+    worker_a.merge_sketches(worker_b.export_sketches())
+    assert worker_a.sketches[Layer.L2_ATOMIC].count == worker_a.sketches[Layer.L2_ATOMIC].samples == 400
+    assert worker_a.sketches[Layer.L2_ATOMIC].quantile(0.95) == single.sketches[Layer.L2_ATOMIC].quantile(0.95)
+    stats = single.get_learning_statistics()
+    assert list(stats) == [Layer.L2_ATOMIC.display_name] and stats["Atomic"]["samples"] == 400
+    assert Layer.L2_ATOMIC.threshold * 0.5 <= single.get_threshold(Layer.L2_ATOMIC) < Layer.L2_ATOMIC.threshold
+
+
+def test_policy_thresholds_come_from_table_and_follow_updates():
+    manager = VelocityPolicyManager("aggressive")
+    table = manager.threshold_table
+    assert table.profiles == ("standard", "conservative", "aggressive")
+    assert manager.get_threshold(Layer.L7_COSMOS) == table.lookup("aggressive", "base", Layer.L7_COSMOS.level) == 0.38 * 1.2
+    manager.set_profile("conservative")
+    assert manager.get_threshold(Layer.L1_QUANTUM) == pytest.approx(0.12 * 0.8)
+
+    manager.set_threshold(Layer.L1_QUANTUM, 0.05)
+    assert manager.threshold_table is not table and manager.get_threshold(Layer.L1_QUANTUM) == 0.05
+    breached, thresholds = manager.check_velocity_breach_batch([Layer.L1_QUANTUM, Layer.L2_ATOMIC], [0.06, 0.06])
+    assert breached.tolist() == [True, False] and thresholds[0] == 0.05
+
+    adaptive = AdaptiveThresholdManager()
+    adaptive.current_thresholds[Layer.L3_MOLECULAR] = 0.2
+    manager.apply_adaptive_thresholds(adaptive)
+    assert manager.current_profile.name == "adaptive" and manager.get_threshold(Layer.L3_MOLECULAR) == 0.2
+    assert "adaptive" in manager.threshold_table.profiles